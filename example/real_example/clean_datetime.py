@@ -0,0 +1,37 @@
+"""
+Convert the NREL BMS download (dirty_data.csv) into the time-series format:
+join the DATE and MST columns into one ISO datetime with its UTC offset.
+
+    python clean_datetime.py dirty_data.csv > time-series-long.csv
+"""
+
+import csv
+import sys
+from datetime import datetime
+
+MST = '-07:00'
+COLUMNS = [
+    ('GlobalCM22', 'Global CM22 Vent [W/m^2]'),
+    ('Temperature', 'Deck Dry Bulb Temp [deg C]'),
+    ('RelativeHumidity', 'Deck RH [%]'),
+    ('Pressure', 'Station Pressure [mBar]'),
+    ('PrecipitableWater', 'Precipitable Water Vapor [cm]'),
+]
+
+
+def clean_datetime(date, mst):
+    parsed = datetime.strptime(date + ' ' + mst, '%m/%d/%Y %H:%M')
+    return parsed.strftime('%Y-%m-%d %H:%M:%S') + MST
+
+
+def main(dirty_file, out_file):
+    reader = csv.DictReader(dirty_file)
+    writer = csv.writer(out_file, lineterminator='\n')
+    writer.writerow(['DateTime'] + [name for name, dirty in COLUMNS])
+    for row in reader:
+        writer.writerow([clean_datetime(row['DATE'], row['MST'])] +
+            [row[dirty] for name, dirty in COLUMNS])
+
+
+if __name__ == '__main__':
+    main(open(sys.argv[1]), sys.stdout)
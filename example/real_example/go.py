@@ -1,6 +1,5 @@
-from collections import Counter
-from numpy import nan
-from rtm import SMARTS
+from numpy import isnan
+from rtm import SMARTS, SBdart
 import rtms
 import pdb
 
@@ -13,45 +12,48 @@ site_info, csv_map, run_config = rtms.importer.config(CONFIG_FILE)
 print "done."
 
 print "Importing data...",
-timeseries_in = rtms.importer.data(DATA_FILE, csv_map)
-print "imported {} rows.".format(len(timeseries_in))
+timeseries = rtms.importer.table(DATA_FILE, csv_map)
+print "imported {} rows.".format(len(timeseries))
+
+
+print "Cleaning data...",
+rtms.table.clean(timeseries)
+rejected = (timeseries['status'] & rtms.table.REJECTED).astype(bool)
+print "rejected {} ({:.1%}) rows.".format(
+    rejected.sum(), float(rejected.sum()) / len(timeseries))
 
 
 print "Selecting clear days...",
 selector = rtms.Selector(site_info['latitude'], site_info['longitude'])
-time_irrad_clear = selector.select(timeseries_in[['time', 'irradiance']])
+rtms.table.select(timeseries, selector)
+clear = timeseries['clear']
 print "selected {} ({:.1%}) clear points.".format(
-    *((lambda c: [c, float(c)/len(timeseries_in)])
-        (Counter(time_irrad_clear['clear'])[True])))
-
-
-print "Preparing clear days for aerosol optical depth optimization...",
-# make a list of dictionaries of settings and targets
-names = time_irrad_clear.dtype.names
-config_dicts = [dict(zip(names, record)) for record in time_irrad_clear]
-optimizeable = []
-for config_dict, clear in zip(config_dicts, time_irrad_clear['clear']):
-    if clear:
-        config = dict(config_dict)
-        config.pop('clear')
-        target = config.pop('irradiance')
-        optimizeable.append({
-            'settings': config,
-            'target': target,
-        })
-print "done."
+    clear.sum(), float(clear.sum()) / len(timeseries))
 
 
 print "Submitting to optimizer for SMARTS..."
-aods = rtms.optimize(optimizeable, site_info, SMARTS, 'angstroms_coefficient')
+rtms.table.optimize(timeseries, site_info, SMARTS, 'angstroms_coefficient')
+optimized = clear & ~isnan(timeseries['optimized'])
 print "optimzed {} points ({:.1%}) of {} selected clear points.".format(
-    *((lambda l:((lambda s,t:[s,float(s)/t,t])(l - Counter(aods)[nan],l))
-       )(len(aods))))
+    optimized.sum(), float(optimized.sum()) / clear.sum(), clear.sum())
 
 
 print "Interpolating AOD between successful optimizations...",
-optimes = [o['settings']['time'] for o in optimizeable]
-time_aod = [[t, aod] for t, aod in zip(optimes, aods)]
-interp_aods = rtms.interpolate(time_aod)
+rtms.table.interpolate(timeseries)
+print "done."
+
+
+print "Preparing cloudy points for cloud optical depth optimization...",
+night = (timeseries['status'] & rtms.table.NIGHT).astype(bool)
+cloudy = ~clear & ~night & ~rejected
+cloudy_points = rtms.table.points(timeseries, cloudy)
+cloudy_aods = timeseries['interpolated'][cloudy]
 print "done."
-pdb.set_trace()
\ No newline at end of file
+
+
+print "Submitting to optimizer for SBdart..."
+clouds = rtms.optimize_clouds(cloudy_points, cloudy_aods, site_info, SBdart)
+solved = (~isnan(clouds)).sum()
+print "optimzed {} points ({:.1%}) of {} cloudy points.".format(
+    solved, float(solved) / len(clouds), len(clouds))
+pdb.set_trace()
@@ -1,4 +1,39 @@
-import importer
-from selector import Selector
-from optimizer import optimize
-from interpolator import interpolate
+"""
+    The stages are loaded when they're first used, so that importing rtms (or
+    just one part of it, like rtms.selector) is quick.
+"""
+
+from importlib import import_module
+import lazy
+
+
+_where = {
+    'Selector': 'selector',
+    'optimize': 'optimizer',
+    'optimize_clouds': 'optimizer',
+    'ioptimize': 'optimizer',
+    'low_sun_cost': 'optimizer',
+    'Surrogate': 'optimizer',
+    'Uncertainty': 'optimizer',
+    'interpolate': 'interpolator',
+    'Scratch': 'scratch',
+    'Policy': 'policy',
+    'FailureBudgetError': 'policy',
+}
+_modules = ['importer', 'spectrum', 'stations', 'incremental', 'table',
+    'store', 'workqueue']
+
+__all__ = sorted(_where) + _modules
+
+
+def _find(name):
+    if name in _modules:
+        return import_module('.' + name, __name__)
+    try:
+        module = _where[name]
+    except KeyError:
+        raise AttributeError(name)
+    return getattr(import_module('.' + module, __name__), name)
+
+
+lazy.replace(__name__, _find)
@@ -0,0 +1,133 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    ----
+
+    Find the rows of time-series data that can't be trusted, before any
+    model time is spent on them.
+
+    check looks over a whole structured array (like one from importer.data)
+    at once and gives back a flag for each row:
+
+        BAD_VALUE       a value is outside its limits (see defaults.yaml),
+                        or the irradiance is missing
+        BAD_TIME        the time is a repeat of one before it, or out of
+                        order. the fewest rows are flagged that leave the
+                        rest in order, so one mistyped time doesn't take
+                        all the rows after it down too
+        BAD_OFFSET      the time's UTC offset isn't the one most of the
+                        data has (or it has none)
+
+    Rows with any of these flags (REJECTED) should be left out of selection
+    and optimization. rtms.table.clean puts them in a table's status column.
+
+"""
+
+from bisect import bisect_left
+from calendar import timegm
+from numpy import zeros, uint8, fromiter, isnan, unique, int64, \
+    floor
+import defaults
+
+BAD_VALUE = 8
+BAD_TIME = 16
+BAD_OFFSET = 32
+REJECTED = BAD_VALUE | BAD_TIME | BAD_OFFSET
+
+
+def epoch(times):
+    """seconds since 1970 UTC for each (aware) datetime, as int64"""
+    if not len(times):
+        return zeros(0, dtype=int64)
+    # subtracting datetimes is much quicker than converting each one
+    first = times[0].replace(microsecond=0)
+    try:
+        since = fromiter(((t - first).total_seconds() for t in times),
+            dtype=float, count=len(times))
+    except TypeError:
+        # naive and aware mixed together
+        return fromiter((timegm(t.utctimetuple()) for t in times),
+            dtype=int64, count=len(times))
+    return timegm(first.utctimetuple()) + floor(since).astype(int64)
+
+
+def _out_of_order(seconds):
+    """
+    rows outside the longest run of increasing times. where there's a
+    choice (like a repeated time), the earlier rows are kept.
+    """
+    out = zeros(len(seconds), dtype=bool)
+    if (seconds[1:] > seconds[:-1]).all():
+        return out
+    # the longest decreasing run, backwards: ties go to the earlier rows
+    backwards = [-s for s in seconds[::-1].tolist()]
+    tails, tail_rows, previous = [], [], []
+    for row, value in enumerate(backwards):
+        k = bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tail_rows.append(row)
+        else:
+            tails[k] = value
+            tail_rows[k] = row
+        previous.append(tail_rows[k - 1] if k else -1)
+    out[:] = True
+    row = tail_rows[-1]
+    while row >= 0:
+        out[len(seconds) - 1 - row] = False
+        row = previous[row]
+    return out
+
+
+def _offset(time):
+    offset = time.utcoffset()
+    if offset is None:
+        return -1 # offsets are whole minutes, so this can't clash
+    return int(offset.total_seconds())
+
+
+def check(data, limits=None):
+    """returns a flag for each row of data; 0 for good ones"""
+    limits = defaults.limits if limits is None else limits
+    flags = zeros(len(data), dtype=uint8)
+    if not len(data):
+        return flags
+
+    for name, (lowest, highest) in limits.items():
+        if name not in data.dtype.names:
+            continue
+        values = data[name].astype(float)
+        flags[(values < lowest) | (values > highest)] |= BAD_VALUE
+    flags[isnan(data['irradiance'].astype(float))] |= BAD_VALUE
+
+    times = data['time']
+    seconds = epoch(times)
+    flags[_out_of_order(seconds)] |= BAD_TIME
+
+    offsets = fromiter((_offset(t) for t in times), dtype=int64,
+        count=len(times))
+    found, counts = unique(offsets, return_counts=True)
+    usual = found[counts.argmax()]
+    flags[(offsets != usual) | (offsets == -1)] |= BAD_OFFSET
+
+    return flags
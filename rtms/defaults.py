@@ -21,9 +21,27 @@
     along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import os.path, yaml
-from rtm import settings
+import os.path
+import lazy
 
 defaultspath = os.path.abspath(os.path.join(__file__, '..', 'defaults.yaml'))
-locals().update(yaml.load(open(defaultspath)))
-locals().update({'rtm_settings': settings.defaults})
+
+_loaded = {}
+
+
+def _find(name):
+    """read defaults.yaml (and rtm's settings) the first time they're needed"""
+    if not _loaded:
+        import yaml
+        from rtm import settings
+        _loaded.update(yaml.load(open(defaultspath)))
+        _loaded['rtm_settings'] = settings.defaults
+        _loaded['valid_properties'] = set(settings.defaults.keys() +
+            ['irradiance'])
+    try:
+        return _loaded[name]
+    except KeyError:
+        raise AttributeError(name)
+
+
+lazy.replace(__name__, _find)
@@ -68,15 +68,33 @@
     if no mapping is provided: try to use all columns by column name
     if mapping is provided: try to use ONLY mapped column by mapped name
 
+
+    table:
+
+    same as data, but with room for everything the other stages fill in.
+    see rtms.table.
+
+
+    config:
+
+    the checks are compiled once into a Schema. checked configs are cached by
+    the hash of their contents, so a config seen before isn't parsed again.
+    the cache can be handed to worker processes with configs/share_configs.
+
 """
 
 import logging
 from copy import deepcopy
+from hashlib import sha1
 import yaml
-from numpy import genfromtxt, nan
+from numpy import genfromtxt, nan, atleast_1d
 from numpy.lib._iotools import ConverterError
 from dateutil import parser as dtparser
 import defaults
+from table import build as build_table
+
+
+_Loader = getattr(yaml, 'CLoader', yaml.Loader) # libyaml's, if it's there
 
 
 class DateTimeParseError(ConverterError): pass
@@ -85,88 +103,133 @@ class DateTimeParseError(ConverterError): pass
 class HeaderError(KeyError): pass
 
 
-VALID_PROPERTIES = set(defaults.rtm_settings.keys() + ['irradiance'])
+class Schema(object):
+    """
+    What a config has to look like, worked out once rather than per config.
+    """
+
+    def __init__(self, valid_properties, run):
+        self.required = frozenset(['info', 'csv_map'])
+        self.required_info = frozenset(['latitude', 'longitude'])
+        self.required_map = frozenset(['time', 'irradiance'])
+        self.additional = frozenset(['run'])
+        self.sections = self.required | self.additional
+        self.valid = frozenset(valid_properties)
+        self.run = run
+        self.valid_run = frozenset(run)
+
+    def check(self, parsed):
+        """returns info, map, run"""
+
+        # make sure we got a dict
+        if not isinstance(parsed, dict):
+            raise TypeError("Settings did not parse to a dictionary: %s" %
+                parsed)
+
+        sections = set(parsed.keys())
+
+        # make sure we got the right dicts
+        if not sections >= self.required:
+            raise KeyError("Missing config sections: " +
+                ", ".join(self.required - sections))
+
+        # make sure our dicts contain dicts
+        for subdict in (sections & self.sections):
+            if not isinstance(parsed[subdict], dict):
+                raise TypeError("config section didn't import as dict: %s" %
+                    subdict)
+
+        # check if any other sections are there for some reason
+        if not sections <= self.sections:
+            logging.warning('Ignoring extraneous sections in the config: ' +
+                ', '.join(sections - self.sections))
+
+        # check we have the necessary info
+        info_set = set(parsed['info'])
+        if not self.required_info <= info_set:
+            raise ValueError('Missing info properties: ' +
+                ', '.join(self.required_info - info_set))
+        # make it all legit
+        if not info_set <= self.valid:
+            logging.warning('ignoring invalid properties: ' +
+                ', '.join(info_set - self.valid))
+            info_set &= self.valid
+
+        # check we have the necessary mappings
+        map_set = set(parsed['csv_map'])
+        if not self.required_map <= map_set:
+            raise ValueError('Missing csv map properties: ' +
+                ', '.join(self.required_map - map_set))
+        # make it all legit
+        if not map_set <= self.valid:
+            logging.warning('ignoring invalid mappings: ' +
+                ', '.join(map_set - self.valid))
+            map_set &= self.valid
+
+        if not info_set.isdisjoint(map_set):
+            logging.warning('info settings {} will be overridden by the '
+                'mapped csv values for that setting'.format(
+                ', '.join(info_set & map_set)))
+
+        # deal with no run settings
+        run_dict = deepcopy(self.run)
+        try:
+            run_dict.update(parsed['run'])
+        except KeyError:
+            logging.info('no run settings found in config, using defaults')
+
+        # check that all run settings are legit
+        if not set(run_dict) <= self.valid_run:
+            logging.warning('ignoring invalid run settings: ' +
+                ', '.join(set(run_dict) - self.valid_run))
+
+        info_dict = {k:v for k, v in parsed['info'].items() if k in info_set}
+        map_dict = {k:v for k, v in parsed['csv_map'].items() if k in map_set}
+        return info_dict, map_dict, run_dict
+
+
+_schema = []
+_configs = {} # checked configs, by the sha1 of their contents
+
+
+def schema():
+    """the config schema, compiled the first time it's needed"""
+    if not _schema:
+        _schema.append(Schema(defaults.valid_properties, defaults.run))
+    return _schema[0]
 
 
 def config(config_file):
-    """returns info, map, run"""
-
-    required = set(['info', 'csv_map'])
-    required_info = set(['latitude', 'longitude'])
-    required_map = set(['time', 'irradiance'])
-    additional = set(['run'])
-    valid_run = set(['save_everything', 'multiprocessing',
-                        'processes', 'verbosity'])
-
-    parsed = yaml.load(config_file)
-
-    # make sure we got a dict
-    if not isinstance(parsed, dict):
-        raise TypeError("Settings did not parse to a dictionary: %s" % parsed)
-
-    sections = set(parsed.keys())
-
-    # make sure we got the right dicts
-    if not sections >= required:
-        raise KeyError("Missing config sections: " +
-            ", ".join(required - sections))
-
-    # check if optional sectons are present
-    optionals = additional & sections
-
-    # make sure our dicts contain dicts
-    for subdict in (required | optionals):
-        if not isinstance(parsed[subdict], dict):
-            raise TypeError("config section didn't import as dict: %s" %
-                subdict)
-
-    # check if any other sections are there for some reason
-    if not sections <= (required | additional):
-        logging.warning('Ignoring extraneous sections in the config: ' +
-            ', '.join(sections - (required | additional)))
-
-    # check we have the necessary info
-    info_set = set(parsed['info'])
-    if not required_info <= info_set:
-        raise ValueError('Missing info properties: ' +
-            ', '.join(required_info - info_set))
-    # make it all legit
-    if not info_set <= VALID_PROPERTIES:
-        logging.warning('ignoring invalid properties: ' +
-            ', '.join(info_set - VALID_PROPERTIES))
-        info_set &= VALID_PROPERTIES
-
-    # check we have the necessary mappings
-    map_set = set(parsed['csv_map'])
-    if not required_map <= map_set:
-        raise ValueError('Missing csv map properties: ' + 
-            ', '.join(required_map - map_set))
-    # make it all legit
-    if not map_set <= VALID_PROPERTIES:
-        logging.warning('ignoring invalid mappings: ' +
-            ', '.join(map_set - VALID_PROPERTIES))
-        map_set &= VALID_PROPERTIES
-
-
-    if not info_set.isdisjoint(map_set):
-        logging.warning('info settings {} will be overridden by the mapped '
-            'csv values for that setting'.format(', '.join(info_set & map_set)))
-
-    # deal with no run settings
-    run_dict = deepcopy(defaults.run)
+    """
+    returns info, map, run
+
+    config_file can be a file or a string. configs are only parsed and
+    checked the first time their contents are seen.
+    """
+    if hasattr(config_file, 'read'):
+        config_file = config_file.read()
+    key = sha1(config_file).hexdigest()
     try:
-        run_dict.update(parsed['run'])
+        checked = _configs[key]
     except KeyError:
-        logging.info('no run settings found in config, using defaults')
+        parsed = yaml.load(config_file, Loader=_Loader)
+        checked = _configs[key] = schema().check(parsed)
+    return deepcopy(checked)
+
+
+def configs():
+    """the configs checked so far, to hand to share_configs in a worker"""
+    return dict(_configs)
 
-    # check that all run settings are legit
-    if not set(run_dict) <= set(defaults.run):
-        logging.warning('ignoring invalid run settings: ' +
-            ', '.join(set(defaults.run) - set(run_dict)))
 
-    info_dict = {k:v for k, v in parsed['info'].items() if k in info_set}
-    map_dict = {k:v for k, v in parsed['csv_map'].items() if k in map_set}
-    return info_dict, map_dict, run_dict
+def share_configs(checked):
+    """
+    Use configs checked elsewhere, like in a Pool initializer:
+
+        Pool(initializer=importer.share_configs,
+            initargs=(importer.configs(),))
+    """
+    _configs.update(checked)
 
 
 def data(data_file, column_map=None):
@@ -216,8 +279,12 @@ def data(data_file, column_map=None):
             ", ".join(basic_properties - col_names), trimmed.dtype.names))
 
     # verify that all the columns are legit
-    if not col_names <= VALID_PROPERTIES:
+    if not col_names <= defaults.valid_properties:
         raise HeaderError("Invalid header names: " +
-            ", ".join(col_names - VALID_PROPERTIES))
+            ", ".join(col_names - defaults.valid_properties))
 
     return trimmed
+
+
+def table(data_file, column_map=None):
+    return build_table(atleast_1d(data(data_file, column_map)))
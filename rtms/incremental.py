@@ -0,0 +1,159 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    ----
+
+    Keep up with a live station feed without redoing the whole history.
+
+    A Feed remembers how far into the data file it has read, and just enough
+    of what came before to carry on where it left off:
+
+        * the last two daytime rows, for the selector: the newest one was
+          flagged without knowing what came next, so it gets flagged again
+          once it does, and the one before it provides its backward
+          derivative.
+        * the last known AOD, and any points after it still waiting on the
+          next one, for the interpolator.
+
+    Each update hands back rows for the new data, led by any rows that revise
+    ones handed back before (matched by time). Use merge to fold them into
+    existing output. Merged output is the same as running the whole file
+    through in one go.
+
+    A feed's state can be saved and loaded between runs.
+
+"""
+
+import cPickle as pickle
+from StringIO import StringIO
+from numpy import atleast_1d, concatenate, nan
+import importer
+from selector import Selector, append_field
+from interpolator import interpolate, NoValidDataError
+
+
+class Feed(object):
+    """Incremental import, selection and interpolation for one station."""
+
+    def __init__(self, latitude, longitude, column_map=None):
+        self.selector = Selector(latitude, longitude)
+        self.column_map = column_map
+        self.last_time = None
+        # importer
+        self.header = None
+        self.offset = 0
+        # selector
+        self.context = None
+        self.final = 0 # leading context rows already handed back for good
+        # interpolator
+        self.anchor = None
+        self.pending = []
+
+    def read(self, data_file):
+        """import any complete rows added to data_file since the last read"""
+        if self.header is None:
+            self.header = data_file.readline()
+            self.offset = data_file.tell()
+        data_file.seek(self.offset)
+        chunk = data_file.read()
+        complete = chunk.rfind('\n') + 1 # leave a half-written row for later
+        if not complete:
+            return None
+        self.offset += complete
+        return atleast_1d(importer.data(StringIO(self.header + chunk[:complete]),
+            self.column_map))
+
+    def select(self, data):
+        """
+        select the rows of data newer than any seen before.
+
+        data must be in time order, with time and irradiance first like for
+        Selector.select. returns the selector's output for the new rows,
+        led by the revised last daytime row from the previous update.
+        """
+        if self.last_time is not None:
+            data = data[data['time'] > self.last_time]
+        if not len(data):
+            return append_field(data, ('clear', bool))
+        self.last_time = data['time'][-1]
+
+        skip = 0
+        if self.context is not None:
+            skip = self.final
+            data = concatenate([self.context.astype(data.dtype), data])
+        if len(data) < 2:
+            # not enough to go on. hang on to it until there is.
+            self.context, self.final = data, 0
+            return append_field(data[:0], ('clear', bool))
+
+        selected = self.selector.select(data)
+        daytime = data[~(data['irradiance'] < self.selector.night)]
+        self.context = daytime[-2:].copy()
+        self.final = max(len(self.context) - 1, 0)
+        return selected[skip:]
+
+    def interpolate(self, series):
+        """
+        interpolate [[time, value or nan], ...] as if joined onto everything
+        before. returns the filled-in series, led by any points revised now
+        that there's a value after them.
+        """
+        anchored = [self.anchor] if self.anchor else []
+        joined = anchored + self.pending + [list(point) for point in series]
+        if not joined:
+            return []
+        try:
+            filled = interpolate(joined)
+        except NoValidDataError:
+            self.pending = joined[len(anchored):]
+            return []
+        known = [i for i, point in enumerate(joined) if point[1] is not nan]
+        self.anchor = list(joined[known[-1]])
+        self.pending = joined[known[-1] + 1:]
+        return filled[len(anchored):]
+
+    def save(self, state_file):
+        pickle.dump(self, state_file, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(state_file):
+        return pickle.load(state_file)
+
+
+def merge(existing, update):
+    """
+    fold rows from a Feed into a list of existing output rows, in place.
+
+    rows are anything indexed by time first. rows of the update with a time
+    already in existing replace that row, and the rest are appended.
+    """
+    last = existing[-1][0] if existing else None
+    for row in update:
+        if last is not None and row[0] <= last:
+            for i in xrange(len(existing) - 1, -1, -1):
+                if existing[i][0] == row[0]:
+                    existing[i] = row
+                    break
+        else:
+            existing.append(row)
+    return existing
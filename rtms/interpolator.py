@@ -33,10 +33,14 @@
     NaN, the tool will perform a linear interpolation from the nearest
     data points on either side and replace the NaN the new value.
 
+    interpolate_column does the same for separate arrays of times and
+    values, all at once, and can write the result into an existing array
+    (like a column of a table).
+
 """
 
 from copy import deepcopy
-from numpy import nan
+from numpy import nan, isnan, interp, fromiter, asarray
 
 class NoValidDataError(ValueError): pass
 
@@ -90,4 +94,25 @@ def interpolate(input_data):
                 delta_v = slope * delta_t.total_seconds()
                 out[point_index][1] = intercept + delta_v
 
-    return out
\ No newline at end of file
+    return out
+
+
+def interpolate_column(times, values, out=None):
+    """
+    times: datetimes, in order. values: floats, nan where missing.
+    returns out (a new array if not given) with every nan filled in.
+    """
+    values = asarray(values, dtype=float)
+    if not len(values):
+        return values.copy() if out is None else out
+    known = ~isnan(values)
+    if not known.any():
+        raise NoValidDataError('There must be at least one data point')
+    start = times[0]
+    seconds = fromiter(((t - start).total_seconds() for t in times),
+        dtype=float, count=len(times))
+    filled = interp(seconds, seconds[known], values[known])
+    if out is None:
+        return filled
+    out[:] = filled
+    return out
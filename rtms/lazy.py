@@ -0,0 +1,62 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    Modules that only load what they need when it's first asked for.
+
+    Importing everything up front costs a few tenths of a second (yaml, rtm
+    and numpy, mostly), which every pool worker and quick script pays. A
+    module can replace itself with a LazyModule, with a function that finds
+    any attribute it doesn't have yet:
+
+        lazy.replace(__name__, find)
+
+    find(name) should return the value or raise AttributeError. Whatever it
+    returns is kept on the module, so it's only found once.
+
+"""
+
+import sys
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+
+    def __init__(self, module, find):
+        super(LazyModule, self).__init__(module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # python 2 clears a module's globals when it's collected, and the
+        # find function still needs them.
+        self._module = module
+        self._find = find
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        value = self._find(name)
+        setattr(self, name, value)
+        return value
+
+
+def replace(name, find):
+    sys.modules[name] = LazyModule(sys.modules[name], find)
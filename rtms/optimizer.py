@@ -50,11 +50,20 @@
 
 """
 
+from calendar import timegm
+from collections import deque, OrderedDict
 from copy import deepcopy
+from datetime import datetime
+from itertools import chain, islice
 import logging
-from numpy import nan
+from uuid import uuid4
+from math import log
+from numpy import nan, isnan, array, dot, sqrt, mean
+from numpy.linalg import lstsq
 from fmm import zeroin, BadBoundsError, NoConvergeError
 from rtm import RTMError
+from rtm.tools.solar import extraterrestrial_radiation
+from policy import Policy, EvaluationTimeout
 
 
 class Single_Optimizer(object):
@@ -65,58 +74,709 @@ class Single_Optimizer(object):
     """
     
     def __init__(self, parameter, bounds, tolerance,
-        irradiance='global'):
+        irradiance='global', spread=None, outputs=(), policy=None,
+        surrogate=None, uncertainty=None):
         """
         parameter: a model config setting that the particular rtm supports.
         bounds: a two-elemnt tuple defining some x which bound the solution.
         a solution returned will be within +/- tolerance + epsilon of whatever
         target irradiance is passed to optimize.
+        spread: half-width of the bracket tried around a guess before falling
+        back to bounds. guesses are ignored if it's not set.
+        outputs: model properties to keep from the solution, in
+        meta['outputs'].
+        policy: time limits and retries (see policy.py).
+        surrogate: a Surrogate to suggest a bracket when there's no guess.
+        uncertainty: an Uncertainty; stop as soon as the irradiance is within
+        it of the target, even if x isn't within tolerance yet.
         """
         self.parameter = parameter
         self.bounds = bounds
         self.tolerance = tolerance
         self.irradiance = irradiance
+        self.spread = spread
+        self.outputs = outputs
+        self.policy = policy or Policy()
+        self.surrogate = surrogate
+        self.uncertainty = uncertainty
 
-    def optimize(self, model, target_irradiance):
+    def optimize(self, model, target_irradiance, guess=None):
+        targets = {}
+        if isinstance(target_irradiance, dict):
+            targets = target_irradiance
+            target_irradiance = targets[self.irradiance]
         self.meta = {
             'model': dict(model),
             'parameter': self.parameter,
             'target_irradiance': target_irradiance,
+            'targets': targets,
+            'guess': guess,
             'iterations': {},
+            'scores': {},
             }
+        deadline = self.policy.deadline()
+        close_enough = -1
+        if self.uncertainty is not None:
+            close_enough = self.uncertainty(target_irradiance)
+        wanted = set(targets) | set([self.irradiance])
+
+        def run():
+            raw = model.irradiance
+            return raw, _read(raw, wanted)
 
         def f(x):
+            if x in self.meta['iterations']:
+                return self.meta['iterations'][x]
             model.update({self.parameter: x})
-            diff = model.irradiance[self.irradiance] - target_irradiance
+            raw, irradiance = self.policy.evaluate(run, deadline)
+            diff = irradiance[self.irradiance] - target_irradiance
             self.meta['iterations'].update({x: diff})
+            if targets:
+                self.meta['scores'][x] = dict((k, irradiance[k] - v)
+                    for k, v in targets.items())
+            self._last = (x, raw)
+            if abs(diff) <= close_enough:
+                raise _Close(x)
             return diff
 
-        result = zeroin(self.bounds[0], self.bounds[1], f, self.tolerance)
+        spread = self.spread
+        surrogate = self.surrogate and self.surrogate.local()
+        if surrogate and (guess is None or not spread):
+            proposal, error = surrogate.propose(model, target_irradiance)
+            if proposal is not None:
+                guess, spread = proposal, max(error, self.tolerance / 2.)
+                self.meta['surrogate'] = proposal
+
+        try:
+            result = self._solve(f, guess, spread)
+        except _Close as close:
+            result = close.x
+        finally:
+            if surrogate:
+                surrogate.learn(model, target_irradiance,
+                    self.meta['iterations'])
         self.meta['model'].update({self.parameter: result})
+        if self.outputs:
+            self.meta['outputs'] = self._outputs(model, result)
 
         return result
 
+    def _solve(self, f, guess, spread):
+        if spread and guess is not None and not isnan(guess):
+            lower = max(self.bounds[0], guess - spread)
+            upper = min(self.bounds[1], guess + spread)
+            try:
+                return zeroin(lower, upper, f, self.tolerance)
+            except BadBoundsError:
+                logging.debug('guess {} missed, using bounds'.format(guess))
+        return self._bracketed(f)
+
+    def _bracketed(self, f):
+        """solve within bounds, widening them as many times as we can"""
+        bounds = self.bounds
+        for attempt in range(1, self.policy.retries + 1):
+            try:
+                return zeroin(bounds[0], bounds[1], f, self.tolerance)
+            except BadBoundsError:
+                bounds = self.policy.widened(self.bounds, attempt)
+                logging.debug('not bracketed, trying {}'.format(bounds))
+        return zeroin(bounds[0], bounds[1], f, self.tolerance)
+
+    def _outputs(self, model, result):
+        """grab outputs at the solution, only evaluating again if we must"""
+        if list(self.outputs) == ['components']:
+            return {'components': self._components(result)}
+        x, irradiance = self._last
+        if x != result:
+            model.update({self.parameter: result})
+            irradiance = self.policy.evaluate(lambda: model.irradiance)
+        outputs = {}
+        for name in self.outputs:
+            if name == 'irradiance':
+                outputs[name] = self.policy.evaluate(
+                    lambda: _read(irradiance, irradiance))
+            elif name == 'components':
+                outputs[name] = self._components(result)
+            else:
+                outputs[name] = self.policy.evaluate(
+                    lambda: getattr(model, name))
+        return outputs
+
+    def _components(self, result):
+        """each component's own answer, and its residual at the solution"""
+        at_result = self.meta['scores'].get(result, {})
+        scores = sorted(self.meta['scores'].items())
+        components = {}
+        for name, measured in self.meta['targets'].items():
+            x = nan
+            for (x0, s0), (x1, s1) in zip(scores, scores[1:]):
+                d0, d1 = s0[name], s1[name]
+                if d0 == 0 or d0 * d1 < 0:
+                    x = _between(x0, x1, d0 + measured, d1 + measured,
+                        measured)
+                    break
+            components[name] = {
+                'x': x,
+                'residual': at_result.get(name, nan),
+            }
+        return components
+
     def clean_up(self):
         raise NotImplementedError
 
 
+class _Local(object):
+    """
+    This process's copies of pools (or surrogates), by key. Only the last
+    few used are kept, so a long-lived worker doesn't hang on to everything
+    it has ever been handed.
+    """
+
+    def __init__(self, keep=8):
+        self.keep = keep
+        self.items = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, default):
+        value = self.items.pop(key, default)
+        self.items[key] = value
+        while len(self.items) > self.keep:
+            self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.items.clear()
+
+
+_local_surrogates = _Local()
+
+
+class Surrogate(object):
+    """
+    A cheap guess at the answer, fitted to the model evaluations so far.
+
+    Each evaluation at some x gave an irradiance; that's a point whose answer
+    is x. The fit is a least-squares one, of x on the log of the clearness
+    index and the height of the sun (Beer-Lambert-ish), plus any settings
+    named in columns (like 'pressure'). Nothing is proposed until warmup
+    evaluations have been seen. Only the last `memory` are kept.
+
+    propose gives (guess, spread), where spread is a few times the fit's rms
+    error. Like ModelPool, use local() to keep learning within a worker.
+    """
+
+    def __init__(self, columns=(), warmup=20, memory=2000, spread=3.0):
+        self.columns = list(columns)
+        self.warmup = warmup
+        self.memory = memory
+        self.spread = spread
+        self.key = uuid4().hex
+        self.samples = []
+        self.fit = None
+
+    def local(self):
+        return _local_surrogates.get(self.key, self)
+
+    def _features(self, model, irradiances):
+        G0 = extraterrestrial_radiation(model['time'], model['latitude'],
+            model['longitude'])
+        if G0 <= 0:
+            return []
+        height = G0 / 1367.
+        extra = [model[c] for c in self.columns]
+        return [[1, log(e / G0), log(e / G0) * height, height] + extra
+            if e > 0 else None for e in irradiances]
+
+    def learn(self, model, target, iterations):
+        xs = list(iterations)
+        features = self._features(model, [target + iterations[x] for x in xs])
+        self.samples.extend((f, x) for f, x in zip(features, xs) if f)
+        del self.samples[:-self.memory]
+        self.fit = None
+
+    def propose(self, model, target):
+        if len(self.samples) < self.warmup:
+            return None, None
+        features = self._features(model, [target])
+        if not features or features[0] is None:
+            return None, None
+        if self.fit is None:
+            X = array([f for f, x in self.samples], dtype=float)
+            y = array([x for f, x in self.samples], dtype=float)
+            coefficients = lstsq(X, y, rcond=None)[0]
+            error = sqrt(mean((dot(X, coefficients) - y) ** 2))
+            self.fit = coefficients, error
+        coefficients, error = self.fit
+        return dot(features[0], coefficients), self.spread * error
+
+
+def _read(irradiance, names):
+    """
+    the named components, as a dict. the real models' irradiance is lazy (the
+    model only runs when a component is read), so this has to happen inside
+    the policy's time limits.
+    """
+    return dict((name, irradiance[name]) for name in names)
+
+
+def _between(x0, x1, e0, e1, target):
+    """
+    where between x0 and x1 the irradiance is target, taking it to fall off
+    exponentially (Beer-Lambert) if it can, otherwise linearly.
+    """
+    if min(e0, e1, target) > 0:
+        e0, e1, target = log(e0), log(e1), log(target)
+    return x0 + (x1 - x0) * (e0 - target) / (e0 - e1)
+
+
+class _Close(Exception):
+    """raised from inside zeroin to stop at x"""
+
+    def __init__(self, x):
+        self.x = x
+
+
+class Uncertainty(object):
+    """
+    How well the target irradiance is known: absolute (W/m^2) plus relative
+    (a fraction of the target). Eg. a thermopile pyranometer might be
+    Uncertainty(10, 0.02). There's no point solving more closely than this.
+    """
+
+    def __init__(self, absolute=0, relative=0):
+        self.absolute = absolute
+        self.relative = relative
+
+    def __call__(self, target):
+        return self.absolute + self.relative * abs(target)
+
+
+class _Row(object):
+    """the settings in a row of a structured array, without copying them"""
+
+    def __init__(self, row, names):
+        self.row = row
+        self.names = names
+
+    def __getitem__(self, name):
+        return self.row[name]
+
+    def items(self):
+        return [(name, self.row[name]) for name in self.names]
+
+
+def _changed(settings, model):
+    """just the settings that differ from what the model has already"""
+    return dict((k, v) for k, v in settings.items()
+        if k not in model or model[k] != v)
+
+
+_local_pools = _Local(keep=256) # just snapshots, so cheap to keep many
+_local_models = _Local()
+
+
+def _frozen(value):
+    """something hashable that's equal for equal settings"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _frozen(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class _Models(object):
+    """one process's built models for an rtm, whatever their base settings"""
+
+    def __init__(self):
+        self.free = []
+        self.out = 0
+
+
+class ModelPool(object):
+    """
+    Hands out models that have already been built, set up for a point.
+
+    Building a model can be expensive (the rtm backends set up working
+    directories), so models are built once and reused. Before a model goes
+    out again it's put back to a snapshot of the base settings plus the
+    point's settings, touching only the settings that differ.
+
+    A pool pickles as just what it takes to build its models. Use local() to
+    get this process's copy of a pool, so each worker keeps its own models
+    from task to task. The models themselves are shared by every pool with
+    the same rtm, size and scratch; a pool only adds its base's snapshot, so
+    a worker handed dozens of stations' pools keeps one set of models.
+    With a Scratch (see scratch.py), each worker's models do their file work
+    in that worker's scratch directory, which is cleared whenever all the
+    models are back.
+    """
+
+    def __init__(self, rtm, base_settings, size=1, scratch=None):
+        self.rtm = rtm
+        self.base = dict(base_settings)
+        self.size = size
+        self.scratch = scratch
+        self.models_key = (rtm, size,
+            scratch.root if scratch is not None else None)
+        self.key = self.models_key + (_frozen(self.base),)
+        self.models = None
+        self.snapshot = None
+
+    def __getstate__(self):
+        return {'rtm': self.rtm, 'base': self.base, 'size': self.size,
+            'scratch': self.scratch, 'models_key': self.models_key,
+            'key': self.key}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.models = None
+        self.snapshot = None
+
+    def local(self):
+        """this process's copy of the pool, with its models built"""
+        pool = _local_pools.get(self.key, self)
+        pool.models = _local_models.get(pool.models_key,
+            pool.models or _Models())
+        if pool.snapshot is None:
+            model = pool._build()
+            pool.snapshot = dict(model)
+            if len(pool.models.free) < pool.size:
+                pool.models.free.append(model)
+        while len(pool.models.free) + pool.models.out < pool.size:
+            pool.models.free.append(pool._build())
+        return pool
+
+    def _build(self):
+        model = self.rtm(self.base)
+        if self.scratch is not None:
+            model.target = self.scratch.worker()
+        return model
+
+    def acquire(self, settings=None):
+        """a model with the base settings, updated with settings"""
+        try:
+            model = self.models.free.pop()
+        except IndexError:
+            model = self._build()
+        wanted = dict(self.snapshot)
+        wanted.update(settings.items() if settings else ())
+        for k in [k for k in model if k not in wanted]:
+            del model[k]
+        model.update(_changed(wanted, model))
+        self.models.out += 1
+        return model
+
+    def release(self, model):
+        self.models.free.append(model)
+        self.models.out -= 1
+        if self.scratch is not None and not self.models.out:
+            self.scratch.clear()
+
+
+def _answer(optimizer, answer):
+    if optimizer.outputs:
+        return answer, optimizer.meta.get('outputs')
+    return answer
+
+
 def _optimize(things_list):
-    settings, target, model, optimizer, irradiance, output = things_list
-    model.update(settings)
+    settings, target, pool, optimizer, irradiance, output = things_list
+    pool = pool.local()
+    model = pool.acquire(settings)
     try:
         answer = optimizer.optimize(model, target_irradiance=target)
-    except (BadBoundsError, RTMError) as err:
+    except (BadBoundsError, NoConvergeError, RTMError,
+        EvaluationTimeout) as err:
         logging.error('{}: {}'.format(settings['time'], err))
-        return nan
-    return answer
+        answer = nan
+    finally:
+        pool.release(model)
+    return _answer(optimizer, answer)
 
 
-def optimize(settings_list, base_settings, rtm, parameter, map_func=map,
-    tolerance=0.1, bounds=(0,1), irradiance='global', output='aod'):
-    model = rtm(base_settings)
-    optimizer = Single_Optimizer(parameter, bounds, tolerance)
-    things_list = [
-        [item['settings'], item['target'], model, optimizer,
-        irradiance, output] for item in settings_list
+def _optimize_batch(things_list):
+    """optimize consecutive points, warm-starting each from the last"""
+    items, pool, optimizer, irradiance, output = things_list
+    pool = pool.local()
+    answers = []
+    guess = None
+    for settings, target in items:
+        model = pool.acquire(settings)
+        try:
+            answer = optimizer.optimize(model, target, guess)
+        except (BadBoundsError, NoConvergeError, RTMError,
+        EvaluationTimeout) as err:
+            logging.error('{}: {}'.format(settings['time'], err))
+            answer = nan
+        else:
+            guess = answer
+        finally:
+            pool.release(model)
+        answers.append(_answer(optimizer, answer))
+    return answers
+
+
+def _items(settings_list, target='irradiance', mask=None, names=None,
+    components=None, irradiance='global'):
+    """(settings, target) for each point of a list of dicts or an array"""
+    if not hasattr(settings_list, 'dtype'):
+        return [(item['settings'], item['target']) for item in settings_list]
+    if names is None:
+        measured = set([target] + list((components or {}).values()))
+        names = [n for n in settings_list.dtype.names if n not in measured]
+    rows = settings_list if mask is None else \
+        (settings_list[i] for i in mask.nonzero()[0])
+    if not components:
+        return [(_Row(row, names), row[target]) for row in rows]
+    columns = dict(components, **{irradiance: target})
+    return [(_Row(row, names), dict((k, row[c]) for k, c in columns.items()))
+        for row in rows]
+
+
+def _canonical(value, step):
+    if isinstance(value, datetime):
+        value = timegm(value.utctimetuple())
+    return round(value / float(step))
+
+
+def _dedup(items, precision, target):
+    """the distinct points after rounding, and which one each point is"""
+    unique = []
+    members = []
+    seen = {}
+    for settings, value in items:
+        key = tuple(sorted((name, _canonical(v, precision[name])
+            if name in precision else v) for name, v in settings.items()))
+        values = value.items() if isinstance(value, dict) else [(None, value)]
+        key += tuple(sorted((k, _canonical(v, precision[target])
+            if target in precision else v) for k, v in values))
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append((settings, value))
+        members.append(seen[key])
+    return unique, members
+
+
+def _things(items, pool, optimizer, irradiance, output):
+    """one _optimize task per point"""
+    return [
+        [settings, target, pool, optimizer,
+        irradiance, output] for settings, target in items
     ]
-    return map_func(_optimize, things_list)
+
+
+def optimize(settings_list, base_settings, rtm, parameter, map_func=map,
+    tolerance=0.1, bounds=(0,1), irradiance='global', output='aod',
+    batch_size=None, spread=None, outputs=(), target='irradiance',
+    mask=None, names=None, scratch=None, policy=None, surrogate=None,
+    precision=None, uncertainty=None, components=None, cost=None):
+    """
+    settings_list: points as above, or a structured array (like one from
+    importer.table) with a column for the target; rows are used as they
+    are, rather than copied into a dict each.
+    batch_size: if set, consecutive points are sent to map_func in groups of
+    this many, and each point in a group is started from the solution of the
+    one before it (see spread).
+    outputs: model properties (eg. ['irradiance', 'spectrum']) to return
+    with each value, from the model at the solution:
+    [(0.1, {'spectrum': ...}), (nan, None), ...]
+    target, mask, names: for a structured array, the column to optimize for,
+    the rows to do (all of them by default), and the columns that are
+    settings (all but the target by default).
+    scratch: a Scratch for the models to run in (see scratch.py).
+    policy: limits on time and failures (see policy.py).
+    surrogate: a Surrogate to learn brackets for points without a guess.
+    precision: rounding steps for settings and the target (eg. {'time': 60,
+    'pressure': 1, 'irradiance': 0.5}; seconds, for times). points that round
+    to the same thing are solved once, as the first of them, and all get
+    its answer.
+    uncertainty: an Uncertainty for the target; each point stops being solved
+    once the model is within it.
+    components: for a structured array, {component: column} of other
+    measured components (for dicts, give targets like {'global': 640,
+    'direct': 510}). every model run is scored against them as well, and
+    the 'components' output has where each one's own answer is and how far
+    off the model is from it at the solution:
+    {'direct': {'x': 0.12, 'residual': -4.1}, ...}
+    cost: cost(settings, target) guesses how long a point will take (settings
+    include the base settings), so the longest can go to map_func first.
+    results still come back in order. use a map_func that hands out one task
+    at a time, like Pool.imap: optimize(..., map_func=pool.imap,
+    cost=low_sun_cost)
+    """
+    func, tasks, costs, finish = _plan(settings_list, base_settings, rtm,
+        parameter, tolerance, bounds, irradiance, output, batch_size, spread,
+        outputs, target, mask, names, scratch, policy, surrogate, precision,
+        uncertainty, components, cost)
+    if cost is None:
+        return finish(map_func(func, tasks))
+    return finish(_longest_first(map_func, func, tasks, costs))
+
+
+def _plan(settings_list, base_settings, rtm, parameter, tolerance=0.1,
+    bounds=(0,1), irradiance='global', output='aod', batch_size=None,
+    spread=None, outputs=(), target='irradiance', mask=None, names=None,
+    scratch=None, policy=None, surrogate=None, precision=None,
+    uncertainty=None, components=None, cost=None):
+    """
+    everything optimize does but the map: returns func, the tasks for it,
+    their costs (or None), and finish, which makes the results of
+    map(func, tasks) into optimize's.
+    """
+    pool = ModelPool(rtm, base_settings, scratch=scratch)
+    if components and 'components' not in outputs:
+        outputs = tuple(outputs) + ('components',)
+    optimizer = Single_Optimizer(parameter, bounds, tolerance, irradiance,
+        spread=spread, outputs=outputs, policy=policy, surrogate=surrogate,
+        uncertainty=uncertainty)
+    items = _items(settings_list, target, mask, names, components, irradiance)
+    members = None
+    if precision:
+        items, members = _dedup(items, precision, target)
+    costs = None
+    if cost is not None:
+        costs = _costs(items, base_settings, cost)
+    if not batch_size:
+        func = _optimize
+        tasks = _things(items, pool, optimizer, irradiance, output)
+    else:
+        func = _optimize_batch
+        tasks = [
+            [items[i:i + batch_size], pool, optimizer, irradiance, output]
+            for i in range(0, len(items), batch_size)
+        ]
+        if costs is not None:
+            costs = [sum(costs[i:i + batch_size])
+                for i in range(0, len(items), batch_size)]
+
+    def finish(results):
+        if batch_size:
+            results = chain.from_iterable(results)
+        if policy is not None:
+            missing = (nan, None) if outputs else nan
+            results = policy.enforce(results, len(items), missing)
+        elif batch_size or precision or cost is not None:
+            results = list(results)
+        if precision:
+            return [results[i] for i in members]
+        return results
+
+    return func, tasks, costs, finish
+
+
+def low_sun_cost(settings, target):
+    """
+    a simple guess at a point's cost: the air mass. light through more
+    atmosphere takes the models longer to solve for.
+    """
+    G0 = extraterrestrial_radiation(settings['time'], settings['latitude'],
+        settings['longitude'])
+    return 1367. / max(G0, 50.)
+
+
+def _costs(items, base_settings, cost):
+    costs = []
+    for settings, target in items:
+        full = dict(base_settings)
+        full.update(settings.items())
+        costs.append(cost(full, target))
+    return costs
+
+
+def _longest_first(map_func, func, tasks, costs):
+    """map_func over tasks, most expensive first, with results in order"""
+    order = sorted(range(len(tasks)), key=lambda i: -costs[i])
+    results = [None] * len(tasks)
+    for i, result in zip(order, map_func(func, [tasks[i] for i in order])):
+        results[i] = result
+    return results
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bounded(func, tasks, pool, window):
+    """func over tasks, in order, with no more than window out at once"""
+    if pool is None:
+        for task in tasks:
+            yield func(task)
+        return
+    out = deque()
+    for task in tasks:
+        out.append(pool.apply_async(func, (task,)))
+        if len(out) >= window:
+            yield out.popleft().get()
+    while out:
+        yield out.popleft().get()
+
+
+def ioptimize(points, base_settings, rtm, parameter, pool=None, window=16,
+    tolerance=0.1, bounds=(0,1), irradiance='global', batch_size=None,
+    spread=None, outputs=(), scratch=None, policy=None, surrogate=None,
+    uncertainty=None):
+    """
+    Like optimize, but lazy: points can be any iterable (of the same dicts),
+    and the results are yielded in order. Points are only taken from it as
+    there's room for them.
+
+    pool: a multiprocessing.Pool to do the work in; or here, if None.
+    window: how many tasks (points, or batches) can be out at once.
+
+    A policy's time limits and retries apply, but not its failure budget,
+    which needs the whole run; nor can points be grouped by precision.
+    """
+    model_pool = ModelPool(rtm, base_settings, scratch=scratch)
+    optimizer = Single_Optimizer(parameter, bounds, tolerance, irradiance,
+        spread=spread, outputs=outputs, policy=policy, surrogate=surrogate,
+        uncertainty=uncertainty)
+    items = ((point['settings'], point['target']) for point in points)
+    if not batch_size:
+        tasks = ([settings, target, model_pool, optimizer, irradiance, None]
+            for settings, target in items)
+        return _bounded(_optimize, tasks, pool, window)
+    batches = ([batch, model_pool, optimizer, irradiance, None]
+        for batch in _chunks(items, batch_size))
+    return chain.from_iterable(_bounded(_optimize_batch, batches, pool,
+        window))
+
+
+def optimize_clouds(settings_list, aods, base_settings, rtm, map_func=map,
+    tolerance=0.1, bounds=(0,100), irradiance='global', batch_size=60,
+    spread=5, aod_parameter='angstroms_coefficient',
+    parameter='cloud_optical_depth', outputs=(), scratch=None, policy=None,
+    precision=None, uncertainty=None):
+    """
+    Solve cloudy points for cloud optical depth.
+
+    settings_list is in the same form as for optimize, and should be in time
+    order so that neighbouring points make good guesses for each other. aods
+    is a matching list of aerosol optical depths, usually interpolated from
+    the clear-point optimization. points without an aod are returned nan.
+    """
+    with_aod = []
+    for item, aod in zip(settings_list, aods):
+        if isnan(aod):
+            with_aod.append(None)
+            continue
+        settings = dict(item['settings'])
+        settings[aod_parameter] = aod
+        with_aod.append({'settings': settings, 'target': item['target']})
+
+    results = iter(optimize([item for item in with_aod if item],
+        base_settings, rtm, parameter, map_func, tolerance, bounds,
+        irradiance, 'cloud', batch_size, spread, outputs, scratch=scratch,
+        policy=policy, precision=precision, uncertainty=uncertainty))
+    missing = (nan, None) if outputs else nan
+    return [next(results) if item else missing for item in with_aod]
@@ -0,0 +1,142 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    Limits on how long optimizing can take, and how much of it can fail.
+
+    A model run that hangs would otherwise hold its worker forever, and a
+    batch is only as fast as its slowest point. A Policy bounds that:
+
+        eval_timeout: seconds any one model run may take.
+        point_timeout: seconds all the runs for one point may take together.
+        retries: how many times to try again with wider bounds when the
+            solution isn't bracketed. the upper bound is pushed out by a
+            factor of `widen` each time (the lower bounds of the parameters
+            we optimize are physical limits, like zero aerosols).
+        failures: how many points may fail before giving up (or what fraction
+            of them, if it's below 1).
+        abort: give up by raising FailureBudgetError, with the results so
+            far attached. otherwise the rest of the points are returned nan.
+            with a lazy map_func (itertools.imap) they aren't run at all.
+
+    Time limits use SIGALRM, so they only apply in a process's main thread
+    (which is where multiprocessing.Pool runs tasks). A model run that is cut
+    off fails its point like any other model error.
+
+"""
+
+import logging
+import signal
+from contextlib import contextmanager
+from time import time
+from numpy import isnan
+
+
+class EvaluationTimeout(Exception): pass
+
+
+class FailureBudgetError(Exception):
+
+    def __init__(self, message, results):
+        super(FailureBudgetError, self).__init__(message)
+        self.results = results
+
+
+@contextmanager
+def _alarm(seconds):
+    def timeout(signum, frame):
+        raise EvaluationTimeout('ran out of time ({}s)'.format(seconds))
+    try:
+        old = signal.signal(signal.SIGALRM, timeout)
+    except ValueError:
+        # not the main thread; no way to interrupt it.
+        yield
+        return
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old)
+
+
+def _failed(result):
+    value = result[0] if isinstance(result, tuple) else result
+    return isnan(value)
+
+
+class Policy(object):
+
+    def __init__(self, eval_timeout=None, point_timeout=None, retries=0,
+        widen=2.0, failures=None, abort=True):
+        self.eval_timeout = eval_timeout
+        self.point_timeout = point_timeout
+        self.retries = retries
+        self.widen = widen
+        self.failures = failures
+        self.abort = abort
+
+    def deadline(self):
+        """when the point started now has to be done by"""
+        if self.point_timeout is None:
+            return None
+        return time() + self.point_timeout
+
+    def evaluate(self, func, deadline=None):
+        """call func, giving up if it goes past the limits"""
+        limit = self.eval_timeout
+        if deadline is not None:
+            left = deadline - time()
+            if left <= 0:
+                raise EvaluationTimeout('point ran out of time ({}s)'.format(
+                    self.point_timeout))
+            limit = left if limit is None else min(limit, left)
+        if limit is None:
+            return func()
+        with _alarm(limit):
+            return func()
+
+    def widened(self, bounds, attempt):
+        lower, upper = bounds
+        return lower, lower + (upper - lower) * self.widen ** attempt
+
+    def enforce(self, results, total, missing):
+        """collect results, stopping once too many have failed"""
+        if self.failures is None:
+            return list(results)
+        budget = self.failures
+        if budget < 1:
+            budget = int(budget * total)
+        done = []
+        failed = 0
+        for result in results:
+            done.append(result)
+            failed += _failed(result)
+            if failed > budget:
+                message = '{} of {} points failed after {} (budget {})'\
+                    .format(failed, total, len(done), budget)
+                if self.abort:
+                    raise FailureBudgetError(message, done)
+                logging.error(message + '; giving up on the rest')
+                break
+        return done + [missing] * (total - len(done))
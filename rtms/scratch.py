@@ -0,0 +1,96 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    Somewhere for the models to do their file work.
+
+    SMARTS and SBdart are run through input and output files, so every model
+    evaluation touches the disk. A Scratch is one directory tree for a whole
+    run: each worker process gets its own directory inside it the first time
+    it asks, and its models are pointed there.
+
+    The backends make a new directory for every evaluation and never remove
+    it, so a ModelPool clears its worker's directory each time a model comes
+    back. Only the point being worked on ever has files in the tree.
+
+    Pass tmpfs=True to put the tree in memory (/dev/shm) where there is one;
+    since it's cleared point by point, it stays small.
+    Scratch is just its root, so it can be handed to workers along with
+    everything else; however many copies a worker ends up with, they share
+    its one directory. Close it (or use it in a with block) from the
+    process that made it to clean up all the workers' directories at once.
+
+        with Scratch(tmpfs=True) as scratch:
+            optimize(..., scratch=scratch)
+
+"""
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+
+SHM = '/dev/shm'
+
+_workers = {} # (root, pid): this process's directory
+
+
+class Scratch(object):
+
+    def __init__(self, tmpfs=False, base=None):
+        if base is None and tmpfs and os.path.isdir(SHM):
+            base = SHM
+        self.root = mkdtemp(prefix='rtms-', dir=base)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def worker(self):
+        """
+        this process's directory, made the first time it's asked for. every
+        copy of the scratch in a process gets the same one.
+        """
+        key = self.root, os.getpid()
+        if key not in _workers:
+            _workers[key] = mkdtemp(prefix='{}-'.format(os.getpid()),
+                dir=self.root)
+        return _workers[key]
+
+    def clear(self):
+        """remove everything in this process's directory, if it has one"""
+        path = _workers.get((self.root, os.getpid()))
+        if path is None:
+            return
+        for name in os.listdir(path):
+            entry = os.path.join(path, name)
+            if os.path.isdir(entry) and not os.path.islink(entry):
+                rmtree(entry, ignore_errors=True)
+            else:
+                os.remove(entry)
+
+    def close(self):
+        _workers.pop((self.root, os.getpid()), None)
+        rmtree(self.root, ignore_errors=True)
@@ -49,19 +49,39 @@
         ...
     ]
 
+    For long records, select_parallel splits the work into chunks for a
+    map_func (like Pool.map). Each chunk carries along the nearest daytime
+    row on either side of it, since that's all a row's flag depends on, so
+    the result is the same as select's.
+
+    Rates of change are never worked out across a gap in the data: daytime
+    rows more than `gap` minutes apart (a missing stretch, or the night in
+    between two days) are treated as the ends of separate series.
+
+    The thresholds (night, change, and an optional clearness index test,
+    kt_min) can be set per Selector. To try out lots of them, get the
+    Criteria for the data once: it works out the rates of change and the
+    clearness index for every row up front, so that each set of thresholds
+    after that is just a few array comparisons.
+
+        criteria = Selector(lat, lng).criteria(data)
+        clear = criteria.clear(night=10, change=4, kt_min=0.6)
+        masks = criteria.sweep(changes=[3, 4, 5, 6], kt_mins=[None, 0.5])
+
 """
 
 from copy import deepcopy
-from itertools import chain
-from numpy import nan, rec, empty
+from itertools import chain, product
+from numpy import nan, rec, empty, fromiter, where, zeros, abs as npabs
 from rtm.tools import solar
+from cleaner import epoch
 
 SKIP_NIGHT = True
 NIGHT_CONST = 12 # W/m^2; less than this is night
 #SOLAR_CONST = 1367 # W/m^2
 CHANGE_CONST = 6 # W/m^2 min
-#TIME_CONST = 60 # minutes; spans greater than this are meaningless
-Kt_MIN = 0.5
+TIME_CONST = 60 # minutes; spans greater than this are meaningless
+Kt_MIN = 0.5 # a reasonable kt_min; the clearness index test is off by default
 
 
 class InsufficientDataError(ValueError): pass
@@ -75,30 +95,135 @@ def append_field(to, dtype):
     return new_rec
 
 
+def _select_chunk(things_list):
+    """clear flags for the rows of a chunk between its context rows"""
+    selector, chunk, start, stop = things_list
+    if len(chunk) == 1:
+        # a lone row: nothing to compare with
+        return selector.criteria(chunk).clear(selector.night,
+            selector.change, selector.kt_min)
+    return selector.select(chunk)['clear'][start:stop]
+
+
+def _kt(irradiance, extraterrestrial):
+    """clearness index; zero when the sun is down"""
+    if extraterrestrial > 0:
+        return irradiance / extraterrestrial
+    return 0
+
+
+class Criteria(object):
+    """
+    The numbers the clear-sky tests are made on, for every row of some data.
+
+    Everything that doesn't depend on a threshold is worked out once, here.
+    The rates of change depend on which rows are night (night rows are
+    skipped over), so they're worked out once for each night threshold used.
+    """
+
+    def __init__(self, selector, irr_data):
+        times = irr_data[irr_data.dtype.names[0]]
+        self.irradiance = irr_data[irr_data.dtype.names[1]].astype(float)
+        self.extraterrestrial = fromiter((selector.ext_irrad_calc(t,
+            selector.latitude, selector.longitude) for t in times),
+            dtype=float, count=len(times))
+        seconds = epoch(times)
+        self.minutes = (seconds - seconds[:1]) / 60.0
+        self.gap = selector.gap
+        self.kt = where(self.extraterrestrial > 0,
+            self.irradiance / where(self.extraterrestrial > 0,
+                self.extraterrestrial, 1), 0)
+        self._changes = {}
+
+    def daytime(self, night=NIGHT_CONST):
+        return ~(self.irradiance < night)
+
+    def change(self, night=NIGHT_CONST):
+        """
+        how far each daytime row's rate of change strays from the sun's:
+        the worse of the steps to the daytime rows either side of it.
+        """
+        if night in self._changes:
+            return self._changes[night]
+        days = self.daytime(night).nonzero()[0]
+        dt = self.minutes[days[1:]] - self.minutes[days[:-1]]
+        dirrad = (self.irradiance[days[1:]] - self.irradiance[days[:-1]]) / dt
+        dextra = (self.extraterrestrial[days[1:]] -
+            self.extraterrestrial[days[:-1]]) / dt
+        step = npabs(dextra - dirrad)
+        step[dt > self.gap] = 0 # no step across a gap; same as an end
+
+        change = zeros(len(days))
+        change[1:] = step # to the row before
+        # the row after, only if it's worse (same as max() in select)
+        after = change[:-1]
+        change[:-1] = where(step > after, step, after)
+
+        self._changes[night] = full = zeros(len(self.irradiance))
+        full[days] = change
+        return full
+
+    def clear(self, night=NIGHT_CONST, change=CHANGE_CONST, kt_min=None):
+        """a clear mask, as select would make with these thresholds"""
+        clear = self.daytime(night) & (self.change(night) < change)
+        if kt_min is not None:
+            clear &= self.kt >= kt_min
+        return clear
+
+    def sweep(self, nights=(NIGHT_CONST,), changes=(CHANGE_CONST,),
+        kt_mins=(None,)):
+        """clear masks for every combination, by (night, change, kt_min)"""
+        return dict(((night, change, kt_min),
+            self.clear(night, change, kt_min)) for night, change, kt_min in
+            product(nights, changes, kt_mins))
+
+
 class Selector(object):
-    """docstring for Selector"""
-    def __init__(self, latitude, longitude):
+    """Flags clear-sky points in time-series irradiance."""
+    def __init__(self, latitude, longitude, night=NIGHT_CONST,
+        change=CHANGE_CONST, kt_min=None, gap=TIME_CONST):
+        """
+        night: irradiance below this is night (W/m^2)
+        change: a rate of change further than this from the sun's is cloudy
+        (W/m^2 min)
+        kt_min: if set, the clearness index must be at least this to be clear
+        gap: daytime rows further apart than this aren't compared (minutes)
+        """
         self.latitude = latitude
         self.longitude = longitude
+        self.night = night
+        self.change = change
+        self.kt_min = kt_min
+        self.gap = gap
         self.ext_irrad_calc = solar.extraterrestrial_radiation
+
+    def criteria(self, irr_data):
+        """the Criteria for irr_data, to try out thresholds on"""
+        return Criteria(self, irr_data)
     
     def select(self, irr_data):
         if len(irr_data) <= 1:
             raise InsufficientDataError("At least two data points are needed.")
-        # add a column for clear/cloudy
+        # add a column for clear/cloudy, unless there is one to fill in
         # TODO: handle lists
-        data = append_field(irr_data, ('clear', bool))
+        if 'clear' in irr_data.dtype.names:
+            data = irr_data
+        else:
+            data = append_field(irr_data, ('clear', bool))
+
+        seconds = epoch(data[data.dtype.names[0]])
 
         prev_row, this_row, next_row = None, None, None
         prev_G, this_G, next_G = None, None, None
+        this_s, next_s = None, None
         prev_dt, next_dt = None, None
         prev_dirrad, next_dirrad = None, None
         prev_dextra, next_dextra = None, None
 
-        for next_row in chain(data, [None]):
+        for next_row, next_s in chain(zip(data, seconds), [(None, None)]):
 
             # skip if it's nighttime
-            if next_row and next_row[1] < NIGHT_CONST:
+            if next_row and next_row[1] < self.night:
                 next_row['clear'] = None
                 continue
 
@@ -106,25 +231,71 @@ class Selector(object):
                 next_G = self.ext_irrad_calc(next_row[0],
                     self.latitude, self.longitude)
 
+            next_dt = None
             if this_row and next_row:
-                next_dt = (next_row[0] - this_row[0]).total_seconds() / 60.0
-                next_dirrad = (next_row[1] - this_row[1]) / next_dt
-                next_dextra = (next_G - this_G) / next_dt
+                next_dt = (next_s - this_s) / 60.0
+                if next_dt > self.gap:
+                    next_dt = None # a gap; don't compare across it
+                else:
+                    next_dirrad = (next_row[1] - this_row[1]) / next_dt
+                    next_dextra = (next_G - this_G) / next_dt
 
             if this_row:
                 change = 0
-                if prev_row:
+                if prev_dt is not None:
                     change = abs(prev_dextra - prev_dirrad)
-                if next_row:
+                if next_dt is not None:
                     change = max(change, abs(next_dextra - next_dirrad))
 
-                this_row['clear'] = (change < CHANGE_CONST)
+                this_row['clear'] = (change < self.change)
+                if self.kt_min is not None:
+                    this_row['clear'] &= \
+                        _kt(this_row[1], this_G) >= self.kt_min
 
             # shuffle down
             prev_row, this_row = this_row, next_row
             prev_G, this_G = this_G, next_G
+            this_s = next_s
             prev_dt = next_dt
             prev_dirrad = next_dirrad
             prev_dextra = next_dextra
 
         return data
+
+    def select_parallel(self, irr_data, map_func=map, chunk_size=1440):
+        """
+        Same as select, in chunks of chunk_size rows (a day of minutes by
+        default) spread over map_func.
+        """
+        if len(irr_data) <= 1:
+            raise InsufficientDataError("At least two data points are needed.")
+        if 'clear' in irr_data.dtype.names:
+            data = irr_data
+        else:
+            data = append_field(irr_data, ('clear', bool))
+
+        time_name, irradiance_name = data.dtype.names[:2]
+        times, irradiance = data[time_name], data[irradiance_name]
+        compact = [(time_name, times.dtype), (irradiance_name, irradiance.dtype)]
+        days = (~(irradiance < self.night)).nonzero()[0]
+
+        things_list = []
+        for start in range(0, len(data), chunk_size):
+            stop = min(start + chunk_size, len(data))
+            rows = range(start, stop)
+            before = days.searchsorted(start)
+            if before > 0:
+                rows.insert(0, days[before - 1])
+            after = days.searchsorted(stop)
+            if after < len(days):
+                rows.append(days[after])
+            chunk = empty(len(rows), dtype=compact)
+            chunk[time_name] = times[rows]
+            chunk[irradiance_name] = irradiance[rows]
+            first = int(before > 0)
+            things_list.append([self, chunk, first, first + stop - start])
+
+        for i, clear in enumerate(map_func(_select_chunk, things_list)):
+            start = i * chunk_size
+            data['clear'][start:start + len(clear)] = clear
+        return data
@@ -0,0 +1,163 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    Get spectra out of the models at each point, after optimizing.
+
+    Give it a list of settings (with the optimized parameters filled in) and
+    a path to write to. The model is run at each point, and each spectrum is
+    written as a row of one big float32 array:
+
+        point 0:  [E(wl_0), E(wl_1), E(wl_2), ...]
+        point 1:  [E(wl_0), E(wl_1), E(wl_2), ...]
+        ...
+
+    Rows are written as the results come in, straight into a memory-mapped
+    .npy file, so nothing bigger than a single spectrum is ever held. The
+    wavelengths go in a little file alongside it. Use load to get them back,
+    memory-mapped.
+
+    Points the model can't do are written as a row of nans.
+
+    If the optimizer was asked to keep the 'spectrum' output, its results can
+    be written with from_optimized instead, without running the model again.
+
+"""
+
+from itertools import imap
+import logging
+from numpy import float32, nan, array_equal, load as npload, save as npsave
+from numpy.lib.format import open_memmap
+from rtm import RTMError
+from optimizer import ModelPool
+
+
+def _wavelength_path(path):
+    return path + '.wavelength.npy'
+
+
+class SpectrumWriter(object):
+    """
+    Stream spectra into a (rows x wavelengths) float32 .npy file.
+
+    The file can't be created until the wavelengths are known, so any rows
+    skipped before the first spectrum arrives are held as a count.
+    """
+
+    def __init__(self, path, rows):
+        self.path = path
+        self.rows = rows
+        self.row = 0
+        self.wavelength = None
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def write(self, wavelength, values):
+        if self.data is None:
+            self.wavelength = wavelength.astype(float32)
+            self.data = open_memmap(self.path, mode='w+', dtype=float32,
+                shape=(self.rows, len(wavelength)))
+            self.data[:self.row] = nan
+        elif not array_equal(self.wavelength, wavelength.astype(float32)):
+            raise ValueError('row {}: wavelengths differ from the first '
+                'spectrum written'.format(self.row))
+        self.data[self.row] = values
+        self.row += 1
+
+    def skip(self):
+        if self.data is not None:
+            self.data[self.row] = nan
+        self.row += 1
+
+    def close(self):
+        if self.data is None:
+            # nothing worked. leave an empty array so load still works.
+            self.wavelength = float32([])
+            self.data = open_memmap(self.path, mode='w+', dtype=float32,
+                shape=(self.rows, 0))
+        self.data[self.row:] = nan
+        self.data.flush()
+        npsave(_wavelength_path(self.path), self.wavelength)
+        del self.data
+
+
+def load(path):
+    """returns wavelength, spectra; spectra are memory-mapped read-only"""
+    return npload(_wavelength_path(path)), npload(path, mmap_mode='r')
+
+
+def _spectrum(things_list):
+    settings, pool, component = things_list
+    pool = pool.local()
+    model = pool.acquire(settings)
+    try:
+        spectrum = model.spectrum
+    except RTMError as err:
+        logging.error('{}: {}'.format(settings['time'], err))
+        return None
+    finally:
+        pool.release(model)
+    return spectrum['wavelength'], spectrum[component]
+
+
+def write(spectra, path, rows):
+    """
+    Write (wavelength, values) pairs from any iterable; None skips a row.
+    """
+    with SpectrumWriter(path, rows) as writer:
+        for spectrum in spectra:
+            if spectrum is None:
+                writer.skip()
+            else:
+                writer.write(*spectrum)
+
+
+def from_optimized(results, path, rows, component='global'):
+    """
+    Write spectra kept by optimize(..., outputs=['spectrum']).
+    """
+    def pick(result):
+        value, outputs = result
+        if not outputs:
+            return None
+        spectrum = outputs['spectrum']
+        return spectrum['wavelength'], spectrum[component]
+    write(imap(pick, results), path, rows)
+
+
+def spectra(settings_list, base_settings, rtm, path, map_func=imap,
+    component='global', scratch=None):
+    """
+    Run the model at each point of settings_list and write the spectra.
+
+    map_func should hand back results lazily (itertools.imap, Pool.imap) so
+    they can be written out as they arrive.
+    """
+    pool = ModelPool(rtm, base_settings, scratch=scratch)
+    things_list = ([settings, pool, component] for settings in settings_list)
+    write(map_func(_spectrum, things_list), path, len(settings_list))
@@ -0,0 +1,131 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    ----
+
+    Run many met stations through the optimizer in one go.
+
+    Each station is a config file plus a data file, just like a single run.
+    The clear points of every station are optimized on one shared pool of
+    workers: tasks are dealt out round-robin, one point from each station in
+    turn, so no station queues up behind another and the workers stay busy
+    as the shorter stations run out of points.
+
+    Use an order-preserving map_func that hands out one task at a time, like
+    Pool.imap, for the fairest scheduling. Pool.map works too, but deals
+    tasks out in chunks. With a cost function, the most expensive tasks of
+    all the stations go first instead.
+
+    Results come back per station, in the same order as the stations.
+
+"""
+
+import os.path
+from itertools import izip_longest
+import importer
+from selector import Selector
+from optimizer import _plan, _longest_first
+from table import points as table_points
+
+
+class Station(object):
+    """A met station's settings and its clear points, ready to optimize."""
+
+    def __init__(self, name, info, points):
+        """
+        info: settings for the station's model (from the config info).
+        points: [{'settings': {...}, 'target': ...}, ...] as for optimize.
+        """
+        self.name = name
+        self.info = info
+        self.points = points
+
+    def __repr__(self):
+        return '<Station {}: {} points>'.format(self.name, len(self.points))
+
+
+def clear_points(data, clear):
+    """optimizer points for the rows of data flagged clear"""
+    return table_points(data, clear)
+
+
+def load(config_file, data_file, name=None):
+    """import and select a station's data; returns a Station"""
+    with open(config_file) as f:
+        info, csv_map, run = importer.config(f)
+    with open(data_file) as f:
+        data = importer.data(f, csv_map)
+    selector = Selector(info['latitude'], info['longitude'])
+    selected = selector.select(data[['time', 'irradiance']])
+    if name is None:
+        name = info.get('description',
+            os.path.splitext(os.path.basename(data_file))[0])
+    return Station(name, info, clear_points(data, selected['clear']))
+
+
+def _round_robin(lists):
+    """one from each list in turn, as (list index, item index, item)"""
+    placeholder = object()
+    tagged = [[(i, j, item) for j, item in enumerate(items)]
+        for i, items in enumerate(lists)]
+    for row in izip_longest(*tagged, fillvalue=placeholder):
+        for tagged_item in row:
+            if tagged_item is not placeholder:
+                yield tagged_item
+
+
+def optimize_stations(stations, rtm, parameter, map_func=map,
+    tolerance=0.1, bounds=(0,1), irradiance='global', output='aod',
+    cost=None, **kwargs):
+    """
+    Optimize every station's points on one map_func. kwargs go to optimize
+    (batch_size, policy, scratch, precision, ...).
+
+    cost: as for optimize; the tasks of all the stations are then handed out
+    most expensive first, instead of round-robin.
+
+    returns a list of result lists, one per station, each lined up with that
+    station's points.
+    """
+    if not stations:
+        return []
+    plans = [_plan(station.points, station.info, rtm, parameter,
+        tolerance=tolerance, bounds=bounds, irradiance=irradiance,
+        output=output, cost=cost, **kwargs) for station in stations]
+    func = plans[0][0]
+    order = []
+    tasks = []
+    for i, j, task in _round_robin([plan[1] for plan in plans]):
+        order.append((i, j))
+        tasks.append(task)
+
+    if cost is None:
+        results = map_func(func, tasks)
+    else:
+        results = _longest_first(map_func, func, tasks,
+            [plans[i][2][j] for i, j in order])
+    station_results = [[None] * len(plan[1]) for plan in plans]
+    for (i, j), result in zip(order, results):
+        station_results[i][j] = result
+    return [finish(done) for (_, _, _, finish), done in
+        zip(plans, station_results)]
@@ -0,0 +1,174 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    Keep results on disk, by station and time, and get ranges of them back.
+
+    Each station gets a directory, with one file per (UTC) year:
+
+        results/
+            station-x/
+                2012.npy            the rows, sorted by time
+                2012.index.npy      every `every`th row's time
+                2013.npy
+                ...
+
+    Rows are the derived columns of a table (see rtms.table), with the time
+    as seconds since 1970 UTC instead of a datetime:
+
+        time, clear, optimized, interpolated, status
+
+    Reading a range only opens the years it covers. The years are memory-
+    mapped; the little index finds the stretch of rows the range falls in,
+    and a binary search in just that stretch finds the ends, so only the
+    pages around the ends and the rows asked for are actually read. The
+    index starts with the stride and the number of rows it was made for, so
+    it can be read whatever `every` the reader has, and an index that
+    doesn't go with the rows (caught between two writes) isn't used.
+
+    Writing a table merges it into the years it covers. Rows already stored
+    for the same time are replaced.
+
+        store = Store('results')
+        store.write('station-x', table)
+        store.read('station-x', datetime(2012, 6, 1, tzinfo=utc),
+            datetime(2012, 7, 1, tzinfo=utc))
+
+"""
+
+import os
+from datetime import datetime
+from numpy import array, empty, concatenate, iinfo, int64, uint8, \
+    load as npload, save as npsave
+from cleaner import epoch
+
+RECORD = [
+    ('time', int64),
+    ('clear', bool),
+    ('optimized', float),
+    ('interpolated', float),
+    ('status', uint8),
+]
+
+
+def _seconds(when):
+    """epoch seconds for a datetime (naive ones are taken as UTC) or number"""
+    if isinstance(when, datetime):
+        if when.utcoffset() is None:
+            return int((when - datetime(1970, 1, 1)).total_seconds())
+        return int(epoch([when])[0])
+    return int(when)
+
+
+def _years(seconds):
+    return seconds.astype('datetime64[s]').astype('datetime64[Y]')\
+        .astype(int) + 1970
+
+
+class Store(object):
+
+    def __init__(self, root, every=1024):
+        self.root = root
+        self.every = every
+
+    def _path(self, station, year, suffix='.npy'):
+        return os.path.join(self.root, station, '{}{}'.format(year, suffix))
+
+    def stations(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(os.listdir(self.root))
+
+    def years(self, station):
+        try:
+            names = os.listdir(os.path.join(self.root, station))
+        except OSError:
+            return []
+        return sorted(int(n[:-4]) for n in names
+            if n.endswith('.npy') and n[:-4].isdigit())
+
+    def write(self, station, table):
+        """merge the derived columns of table into the stored years"""
+        rows = empty(len(table), dtype=RECORD)
+        rows['time'] = epoch(table['time'])
+        for name, _ in RECORD[1:]:
+            rows[name] = table[name]
+        if not os.path.isdir(os.path.join(self.root, station)):
+            os.makedirs(os.path.join(self.root, station))
+        years = _years(rows['time'])
+        for year in sorted(set(years)):
+            self._merge(station, year, rows[years == year])
+
+    def _merge(self, station, year, rows):
+        path = self._path(station, year)
+        if os.path.exists(path):
+            rows = concatenate([npload(path), rows])
+        # stable, so where times repeat the new row comes last; keep it.
+        rows = rows[rows['time'].argsort(kind='mergesort')]
+        last = empty(len(rows), dtype=bool)
+        last[:-1] = rows['time'][1:] != rows['time'][:-1]
+        last[-1:] = True
+        rows = rows[last]
+        self._save(self._path(station, year, '.index.npy'),
+            concatenate([[self.every, len(rows)], rows['time'][::self.every]]))
+        self._save(path, rows)
+
+    def _save(self, path, array):
+        # write alongside, then swap it in, so readers never see half a file
+        partial = path + '.partial.npy'
+        npsave(partial, array)
+        os.rename(partial, path)
+
+    def _range(self, station, year, start, end):
+        """the rows of one year with start <= time < end"""
+        index = npload(self._path(station, year, '.index.npy'))
+        rows = npload(self._path(station, year), mmap_mode='r')
+        every, count, index = index[0], index[1], index[2:]
+        if count == len(rows):
+            lo = max(index.searchsorted(start, 'right') - 1, 0) * every
+            hi = min(index.searchsorted(end, 'left') * every, len(rows))
+        else:
+            lo, hi = 0, len(rows)
+        times = rows['time'][lo:hi]
+        return rows[lo + times.searchsorted(start, 'left'):
+            lo + times.searchsorted(end, 'left')]
+
+    def read(self, station, start=None, end=None):
+        """
+        rows with start <= time < end, as a new array. start and end can be
+        datetimes (naive ones are UTC) or epoch seconds; leave either out
+        for no limit.
+        """
+        years = self.years(station)
+        if start is not None:
+            start = _seconds(start)
+            years = [y for y in years if y >= _years(array([start]))[0]]
+        if end is not None:
+            end = _seconds(end)
+            years = [y for y in years if y <= _years(array([end - 1]))[0]]
+        if not years:
+            return empty(0, dtype=RECORD)
+        start = iinfo(int64).min if start is None else start
+        end = iinfo(int64).max if end is None else end
+        return concatenate([self._range(station, year, start, end)
+            for year in years])
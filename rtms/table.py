@@ -0,0 +1,146 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    ----
+
+    One array for the whole pipeline.
+
+    importer.table reads the time-series into a structured array that
+    already has a column for everything the later stages work out:
+
+        clear           selector: is this a clear-sky point?
+        optimized       optimizer: the parameter solved for, or nan
+        interpolated    interpolator: the parameter at every point
+        status          bit flags, see below
+
+    Each stage writes straight into its column, so the data is only copied
+    once, on import. The time and irradiance columns always come first, so
+    the table can be handed to Selector.select as-is.
+
+    status flags:
+
+        NIGHT           too dark to select
+        FAILED          clear, but the optimizer couldn't solve it
+        INTERPOLATED    the interpolated value isn't an optimized one
+
+    and from the cleaner (see rtms.cleaner), any of which mean the row is
+    REJECTED and is left out of selection and optimization:
+
+        BAD_VALUE, BAD_TIME, BAD_OFFSET
+
+"""
+
+from numpy import empty, isnan, nan, uint8
+from interpolator import interpolate_column
+from cleaner import check, BAD_VALUE, BAD_TIME, BAD_OFFSET, REJECTED
+
+DERIVED = [
+    ('clear', bool),
+    ('optimized', float),
+    ('interpolated', float),
+    ('status', uint8),
+]
+DERIVED_NAMES = [name for name, dtype in DERIVED]
+
+NIGHT = 1
+FAILED = 2
+INTERPOLATED = 4
+
+
+def build(data):
+    """a table with data's columns (time and irradiance first) + DERIVED"""
+    names = ['time', 'irradiance'] + [n for n in data.dtype.names
+        if n not in ('time', 'irradiance')]
+    dtype = [(name, data.dtype.fields[name][0]) for name in names] + DERIVED
+    table = empty(data.shape, dtype=dtype)
+    for name in names:
+        table[name] = data[name]
+    table['clear'] = False
+    table['optimized'] = nan
+    table['interpolated'] = nan
+    table['status'] = 0
+    return table
+
+
+def settings_names(table):
+    """the columns that are model settings"""
+    return [name for name in table.dtype.names
+        if name != 'irradiance' and name not in DERIVED_NAMES]
+
+
+def points(table, mask):
+    """optimizer points for the rows picked out by mask"""
+    names = settings_names(table)
+    return [
+        {
+            'settings': dict((name, row[name]) for name in names),
+            'target': row['irradiance'],
+        } for row in table[mask]
+    ]
+
+
+def clean(table, limits=None):
+    """flag rows that can't be trusted. see rtms.cleaner"""
+    table['status'] |= check(table, limits)
+
+
+def select(table, selector):
+    """fill in clear for rows that weren't rejected, and flag the night"""
+    good = (table['status'] & REJECTED) == 0
+    if good.all():
+        selector.select(table)
+    else:
+        # just what select looks at, rather than a copy of every column
+        kept = empty(good.sum(), dtype=[(name, table.dtype[name])
+            for name in ('time', 'irradiance', 'clear')])
+        for name in kept.dtype.names:
+            kept[name] = table[name][good]
+        table['clear'][good] = selector.select(kept)['clear']
+    table['status'][table['irradiance'] < selector.night] |= NIGHT
+
+
+def optimize(table, base_settings, rtm, parameter, **kwargs):
+    """
+    fill in optimized for the clear rows; kwargs go to optimize. if outputs
+    (or components) are asked for, they're returned, one per clear row.
+    """
+    # here, so that importing a table doesn't bring in the whole optimizer
+    from optimizer import optimize as optimize_points
+    clear = table['clear']
+    results = optimize_points(table, base_settings, rtm, parameter,
+        mask=clear, names=settings_names(table), **kwargs)
+    outputs = None
+    if kwargs.get('outputs') or kwargs.get('components'):
+        results = list(results)
+        outputs = [r[1] for r in results]
+        results = [r[0] for r in results]
+    table['optimized'][clear] = results
+    table['status'][clear & isnan(table['optimized'])] |= FAILED
+    return outputs
+
+
+def interpolate(table):
+    """fill in interpolated for every row, from the optimized ones"""
+    interpolate_column(table['time'], table['optimized'],
+        out=table['interpolated'])
+    table['status'][isnan(table['optimized'])] |= INTERPOLATED
@@ -0,0 +1,116 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    --
+
+    A stand-in for the rtm models, so the optimizer machinery can be tested
+    without SMARTS or SBdart. It behaves like an rtm.Model: a dict of
+    settings with an `irradiance` mapping, and is cheap and deterministic.
+
+    FileRTM goes through files on disk like the real backends do.
+
+"""
+
+import os
+from math import exp
+from shutil import rmtree
+from tempfile import mkdtemp
+from numpy import linspace, empty
+from rtm import RTMError
+from rtm.tools import solar
+
+
+class FakeRTM(dict):
+    """Beer-Lambert-ish: aerosols and clouds both knock down the sun."""
+
+    evaluations = 0
+    wavelength = linspace(0.28, 2.5, 223)
+
+    def __init__(self, userconfig=None):
+        super(FakeRTM, self).__init__(userconfig or {})
+
+    @property
+    def irradiance(self):
+        FakeRTM.evaluations += 1
+        G0 = solar.extraterrestrial_radiation(self['time'],
+            self['latitude'], self['longitude'])
+        if G0 <= 0:
+            raise RTMError('the sun is down')
+        aod = self.get('angstroms_coefficient', 0.08)
+        cloud = self.get('cloud_optical_depth', 0)
+        direct = G0 * exp(-aod) * exp(-cloud / 10.0)
+        diffuse = G0 * exp(-aod) * 0.1 / (1 + cloud / 10.0)
+        return {
+            'direct': direct,
+            'diffuse': diffuse,
+            'global': direct + diffuse,
+        }
+
+    @property
+    def spectrum(self):
+        """flat, so that it integrates to the irradiance"""
+        irradiance = self.irradiance
+        width = self.wavelength[-1] - self.wavelength[0]
+        spectrum = empty(len(self.wavelength), dtype=[('wavelength', float),
+            ('direct', float), ('diffuse', float), ('global', float)])
+        spectrum['wavelength'] = self.wavelength
+        for component, value in irradiance.items():
+            spectrum[component] = value / width
+        return spectrum
+
+
+class FileRTM(FakeRTM):
+    """
+    Writes an input deck, "runs" on it, and reads the output back, in a new
+    directory for every evaluation. Without a target the directory is a
+    temporary one, removed afterwards; in a target it's left behind, like
+    the real backends leave theirs.
+    """
+
+    dirs_made = 0
+
+    def __init__(self, userconfig=None):
+        super(FileRTM, self).__init__(userconfig)
+        self.target = None
+
+    def _run(self, path):
+        deck = os.path.join(path, 'input.txt')
+        with open(deck, 'w') as f:
+            f.write(repr(sorted(self.items())))
+        with open(deck) as f:
+            f.read()
+        irradiance = super(FileRTM, self).irradiance
+        with open(os.path.join(path, 'output.txt'), 'w') as f:
+            f.write(repr(sorted(irradiance.items())))
+        with open(os.path.join(path, 'output.txt')) as f:
+            return dict(eval(f.read()))
+
+    @property
+    def irradiance(self):
+        if self.target is not None:
+            return self._run(mkdtemp(dir=self.target))
+        FileRTM.dirs_made += 1
+        path = mkdtemp(prefix='rtms-test-')
+        try:
+            return self._run(path)
+        finally:
+            rmtree(path)
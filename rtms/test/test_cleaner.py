@@ -0,0 +1,102 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from StringIO import StringIO
+from .. import importer, cleaner, table
+from ..selector import Selector
+
+LIMITS = {'irradiance': [0, 2000], 'pressure': [300, 1100]}
+
+
+def imported(rows):
+    return importer.data(StringIO('time,irradiance,pressure\n' +
+        '\n'.join(rows)))
+
+
+class TestCleaner(unittest.TestCase):
+
+    def assertFlags(self, rows, expected):
+        flags = cleaner.check(imported(rows), LIMITS)
+        self.assertEqual(list(flags), expected)
+
+    def testClean(self):
+        self.assertFlags([
+            '2012-01-01 12:00:00-07:00,640,820',
+            '2012-01-01 12:01:00-07:00,641,820',
+        ], [0, 0])
+
+    def testValues(self):
+        self.assertFlags([
+            '2012-01-01 12:00:00-07:00,-5,820',
+            '2012-01-01 12:01:00-07:00,641,2000',
+            '2012-01-01 12:02:00-07:00,nan,820',
+            '2012-01-01 12:03:00-07:00,643,820',
+        ], [cleaner.BAD_VALUE, cleaner.BAD_VALUE, cleaner.BAD_VALUE, 0])
+
+    def testTimes(self):
+        self.assertFlags([
+            '2012-01-01 12:00:00-07:00,640,820',
+            '2012-01-01 12:02:00-07:00,641,820',
+            '2012-01-01 12:02:00-07:00,641,820',
+            '2012-01-01 12:01:00-07:00,641,820',
+            '2012-01-01 12:03:00-07:00,642,820',
+        ], [0, 0, cleaner.BAD_TIME, cleaner.BAD_TIME, 0])
+
+    def testMistypedTime(self):
+        # one time in the future mustn't reject every good row after it
+        self.assertFlags([
+            '2012-01-01 12:00:00-07:00,640,820',
+            '2013-01-01 12:01:00-07:00,641,820',
+            '2012-01-01 12:02:00-07:00,642,820',
+            '2012-01-01 12:03:00-07:00,643,820',
+            '2012-01-01 12:04:00-07:00,644,820',
+            '2012-01-01 12:05:00-07:00,645,820',
+        ], [0, cleaner.BAD_TIME, 0, 0, 0, 0])
+
+    def testOffsets(self):
+        self.assertFlags([
+            '2012-01-01 12:00:00-07:00,640,820',
+            '2012-01-01 13:01:00-06:00,641,820',
+            '2012-01-01 12:02:00-07:00,642,820',
+            '2012-01-01 12:03:00-07:00,643,820',
+            '2012-01-01 12:04:00,644,820',
+        ], [0, cleaner.BAD_OFFSET, 0, 0,
+            # no offset: taken as UTC, which is also out of order
+            cleaner.BAD_OFFSET | cleaner.BAD_TIME])
+
+    def testTableSelectSkipsRejected(self):
+        rows = [
+            '2012-01-01 12:00:00-07:00,640,820',
+            '2012-01-01 12:01:00-07:00,3000,820',
+            '2012-01-01 12:02:00-07:00,641,820',
+        ]
+        t = table.build(imported(rows))
+        table.clean(t, LIMITS)
+        table.select(t, Selector(39.74, 254.82))
+        self.assertEqual(list(t['clear']), [True, False, True])
+        self.assertEqual(list(t['status']), [0, cleaner.BAD_VALUE, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
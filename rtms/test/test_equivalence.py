@@ -0,0 +1,272 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    The fast paths have to give the same answers as the plain versions they
+    stand in for. Each one is run against its reference on seeded random
+    inputs and on the example data:
+
+        Selector.select     Criteria.clear, Selector.select_parallel
+        interpolate         interpolate_column
+        importer.data       importer.table
+        timegm              cleaner.epoch
+
+    The example's clear rows are also checked against a golden file, so that
+    select itself can't drift. If select is meant to change, rewrite it:
+
+        python -m rtms.test.test_equivalence
+
+    Every run is timed; see the timings side by side with nosetests -s.
+
+"""
+
+import os.path
+import unittest
+from calendar import timegm
+from collections import defaultdict
+from datetime import datetime, timedelta
+from random import Random
+from time import time
+from nose.plugins.attrib import attr
+from dateutil import parser as dt
+from StringIO import StringIO
+from numpy import array, nan, isnan, atleast_1d, loadtxt, savetxt
+from .. import selector, interpolator, importer, cleaner
+from .test_selector import LATITUDE, LONGITUDE, EXAMPLE, example_data
+
+SEEDS = range(50)
+EXAMPLE_MAP = {'time': 'DateTime', 'irradiance': 'GlobalCM22',
+    'temperature': 'Temperature', 'pressure': 'Pressure'}
+GOLDEN = os.path.join(os.path.dirname(__file__), 'golden',
+    'time-series-short.clear')
+
+timings = defaultdict(lambda: defaultdict(float)) # what: {how: seconds}
+
+
+def timed(what, how, func, *args, **kwargs):
+    start = time()
+    result = func(*args, **kwargs)
+    timings[what][how] += time() - start
+    return result
+
+
+def setUpModule():
+    global example
+    example = example_data()
+
+
+def tearDownModule():
+    for what, hows in sorted(timings.items()):
+        print '{:<24}'.format(what) + '  '.join('{}: {:.3f}s'.format(how,
+            seconds) for how, seconds in sorted(hows.items()))
+
+
+def random_series(random):
+    """minutes of irradiance, with night, gaps, spikes and noise"""
+    now = dt.parse('2012-06-01 04:00 -0700')
+    level = random.uniform(200, 900)
+    rows = []
+    for i in range(random.randint(2, 400)):
+        now += timedelta(minutes=random.choice([1] * 20 + [2, 5, 61, 600]))
+        if random.random() < 0.1:
+            irradiance = 0
+        else:
+            irradiance = level + random.choice([0, 0, 0,
+                random.uniform(-3, 3), random.uniform(-200, 200)])
+        rows.append((now, irradiance))
+    return array(rows, dtype=[('time', object), ('irradiance', float)])
+
+
+def random_gaps(random):
+    """times and values with nans: leading, trailing, long and short"""
+    now = datetime(2012, 1, 1)
+    times, values = [], []
+    for i in range(random.randint(1, 60)):
+        now += timedelta(seconds=random.choice([60, 60, 60, 120, 3600,
+            3 * 86400 + 7]))
+        times.append(now)
+        values.append(nan if random.random() < 0.4 else
+            random.uniform(-5, 900))
+    values[random.randrange(len(values))] = random.uniform(-5, 900)
+    return times, values
+
+
+def edge_cases():
+    """the little cases from test_selector, as arrays"""
+    def case(*rows):
+        return array([(dt.parse(t), g) for t, g in rows],
+            dtype=[('time', object), ('irradiance', float)])
+    return [
+        case(('01/01/2012 12:00 -0700', 500), ('01/01/2012 12:01 -0700', 501)),
+        case(('01/01/2012 12:00 -0700', 500), ('01/01/2012 12:01 -0700', 510)),
+        case(('01/01/2012 12:00 -0700', 640), ('01/01/2012 12:01 -0700', 641),
+            ('01/01/2012 12:02 -0700', 649)),
+        case(('01/01/2012 12:00 -0700', 640), ('01/01/2012 12:01 -0700', 649),
+            ('01/01/2012 12:02 -0700', 649)),
+        case(('01/01/2012 12:00 -0700', 640), ('01/01/2012 12:01 -0700', 649),
+            ('01/01/2012 12:02 -0700', 640)),
+        case(('01/01/2012 00:00 -0700', 0), ('01/01/2012 00:01 -0700', 0)),
+        case(('01/01/2012 12:00 -0700', 640), ('01/02/2012 00:00 -0700', 0),
+            ('01/02/2012 12:01 -0700', 640)),
+    ]
+
+
+class TestSelector(unittest.TestCase):
+
+    def assertSame(self, data, select, chunk_sizes=(1, 7, 1440)):
+        expected = list(timed('select', 'select', select.select,
+            data.copy())['clear'])
+        criteria = timed('select', 'criteria', select.criteria, data)
+        self.assertEqual(list(timed('select', 'criteria', criteria.clear,
+            select.night, select.change, select.kt_min)), expected)
+        for chunk_size in chunk_sizes:
+            self.assertEqual(list(timed('select', 'parallel',
+                select.select_parallel, data.copy(),
+                chunk_size=chunk_size)['clear']), expected)
+
+    def testRandom(self):
+        for seed in SEEDS:
+            random = Random(seed)
+            data = random_series(random)
+            self.assertSame(data, selector.Selector(LATITUDE, LONGITUDE,
+                change=random.choice([3, 6, 10]),
+                kt_min=random.choice([None, selector.Kt_MIN]),
+                gap=random.choice([5, selector.TIME_CONST])))
+
+    def testEdgeCases(self):
+        for data in edge_cases():
+            self.assertSame(data, selector.Selector(LATITUDE, LONGITUDE))
+
+    def testExample(self):
+        self.assertSame(example, selector.Selector(LATITUDE, LONGITUDE),
+            chunk_sizes=(60, 1440))
+
+    def testGolden(self):
+        clear = selector.Selector(LATITUDE, LONGITUDE).select(
+            example.copy())['clear']
+        self.assertEqual(list(clear.nonzero()[0]),
+            list(loadtxt(GOLDEN, dtype=int)))
+
+
+class TestInterpolator(unittest.TestCase):
+
+    def assertSame(self, times, values):
+        expected = timed('interpolate', 'interpolate',
+            interpolator.interpolate, [[t, v] for t, v in zip(times, values)])
+        out = timed('interpolate', 'column', interpolator.interpolate_column,
+            times, values)
+        # they work through each gap from opposite ends, so only agree to
+        # rounding
+        for (t, reference), value in zip(expected, out):
+            self.assertAlmostEqual(value, reference,
+                delta=1e-12 * max(1, abs(reference)))
+
+    def testRandom(self):
+        for seed in SEEDS:
+            self.assertSame(*random_gaps(Random(seed)))
+
+    def testNaNGaps(self):
+        times = [datetime(2012, 1, 1, 0, m) for m in range(5)]
+        for values in ([nan, 1.0, nan, nan, 4.0], [0.0, nan, 2.0, nan, nan],
+            [nan, nan, nan, nan, 1.0], [1.0, nan, 3.0, nan, 5.0]):
+            self.assertSame(times, values)
+        self.assertSame([datetime(2012, 1, 1), datetime(2012, 1, 3, 1),
+            datetime(2012, 1, 5, 2)], [0.0, nan, 1.0])
+
+    def testAllNaN(self):
+        times = [datetime(2012, 1, 1, 0, m) for m in range(3)]
+        with self.assertRaises(interpolator.NoValidDataError):
+            interpolator.interpolate([[t, nan] for t in times])
+        with self.assertRaises(interpolator.NoValidDataError):
+            interpolator.interpolate_column(times, [nan] * 3)
+
+
+def random_csv(random):
+    """csv text, some of it missing"""
+    now = dt.parse('2012-06-01 04:00 -0700')
+    lines = ['time,irradiance,temperature,pressure']
+    for i in range(random.randint(1, 100)):
+        now += timedelta(minutes=1)
+        lines.append('{},{},{},{}'.format(now,
+            'nan' if random.random() < 0.1 else random.uniform(0, 1000),
+            '' if random.random() < 0.1 else random.uniform(-20, 40),
+            random.randint(800, 1000)))
+    return '\n'.join(lines)
+
+
+class TestImporter(unittest.TestCase):
+
+    def assertSame(self, text, column_map=None):
+        data = timed('import', 'data', importer.data, StringIO(text),
+            column_map)
+        table = timed('import', 'table', importer.table, StringIO(text),
+            column_map)
+        data = atleast_1d(data)
+        self.assertEqual(table.dtype.names[:2], ('time', 'irradiance'))
+        for name in data.dtype.names:
+            expected, got = data[name], table[name]
+            self.assertEqual(got.dtype, expected.dtype)
+            if expected.dtype.kind == 'f':
+                self.assertEqual(list(isnan(got)), list(isnan(expected)))
+                expected, got = expected[~isnan(expected)], got[~isnan(got)]
+            self.assertEqual(list(got), list(expected))
+
+    def testRandom(self):
+        for seed in SEEDS:
+            self.assertSame(random_csv(Random(seed)))
+
+    @attr('slow')
+    def testExample(self):
+        self.assertSame(open(EXAMPLE).read(), EXAMPLE_MAP)
+
+
+class TestEpoch(unittest.TestCase):
+
+    def assertSame(self, times):
+        expected = timed('epoch', 'timegm', lambda: [timegm(t.utctimetuple())
+            for t in times])
+        self.assertEqual(list(timed('epoch', 'epoch', cleaner.epoch, times)),
+            expected)
+
+    def testRandom(self):
+        for seed in SEEDS:
+            self.assertSame(list(random_series(Random(seed))['time']))
+
+    def testExample(self):
+        self.assertSame(list(example['time']))
+
+    def testOffsets(self):
+        self.assertSame([dt.parse('2012-06-01 12:00:30.7 -0700'),
+            dt.parse('2012-06-01 12:00:00 +0000'),
+            dt.parse('2012-06-01 12:00:00'),
+            dt.parse('2012-06-01 11:59:59.2 -0100')])
+
+
+def write_golden():
+    clear = selector.Selector(LATITUDE, LONGITUDE).select(
+        example_data())['clear']
+    savetxt(GOLDEN, clear.nonzero()[0], fmt='%d')
+
+
+if __name__ == '__main__':
+    write_golden()
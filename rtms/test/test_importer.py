@@ -156,6 +156,49 @@ class TestConfigInfo(unittest.TestCase):
             self.assertConfigEqual("", self.basic)
 
 
+class CountingYAML(object):
+    loads = 0
+    CLoader = yaml.Loader
+    Loader = yaml.Loader
+
+    def load(self, *args, **kwargs):
+        CountingYAML.loads += 1
+        return yaml.load(*args, **kwargs)
+
+
+class TestConfigCache(unittest.TestCase):
+
+    def setUp(self):
+        self._yaml = importer.yaml
+        importer.yaml = CountingYAML()
+        CountingYAML.loads = 0
+        importer._configs.clear()
+        self.y_in = yaml.dump(TestConfigInfo.basic)
+
+    def tearDown(self):
+        importer.yaml = self._yaml
+
+    def testParsedOnce(self):
+        first = importer.config(self.y_in)
+        self.assertEqual(importer.config(StringIO(self.y_in)), first)
+        self.assertEqual(CountingYAML.loads, 1)
+
+    def testCopies(self):
+        importer.config(self.y_in)[0]['latitude'] = 0
+        self.assertEqual(importer.config(self.y_in)[0]['latitude'], 39.74)
+
+    def testShare(self):
+        importer.config(self.y_in)
+        checked = importer.configs()
+        importer._configs.clear()
+        importer.share_configs(checked)
+        importer.config(self.y_in)
+        self.assertEqual(CountingYAML.loads, 1)
+
+    def testSchemaOnce(self):
+        self.assertTrue(importer.schema() is importer.schema())
+
+
 class TestDataImporter(unittest.TestCase):
 
     def testValidCSV(self):
@@ -0,0 +1,112 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os.path
+import unittest
+from datetime import datetime, timedelta
+from StringIO import StringIO
+from numpy import nan
+from .. import importer, incremental
+from ..selector import Selector
+from ..interpolator import interpolate
+
+LATITUDE = 39.74 # degrees north
+LONGITUDE = 254.82 # degrees east
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', '..', 'example',
+    'real_example', 'time-series-short.csv')
+CSV_MAP = {'time': 'DateTime', 'irradiance': 'GlobalCM22'}
+
+
+def chunked(things, sizes):
+    start = 0
+    for size in sizes:
+        yield things[start:start + size]
+        start += size
+    yield things[start:]
+
+
+class TestFeed(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        data = importer.data(open(EXAMPLE), CSV_MAP)
+        cls.data = data[['time', 'irradiance']][600:1200].astype(
+            [('time', object), ('irradiance', float)]) # sunset is in here
+        whole = Selector(LATITUDE, LONGITUDE).select(cls.data)
+        cls.selected = [tuple(row) for row in whole]
+
+    def testSelect(self):
+        feed = incremental.Feed(LATITUDE, LONGITUDE)
+        merged = []
+        for chunk in chunked(self.data, [1, 1, 3, 150, 7]):
+            incremental.merge(merged, [tuple(r) for r in feed.select(chunk)])
+        self.assertEqual(merged, self.selected)
+
+    def testSelectOldRows(self):
+        feed = incremental.Feed(LATITUDE, LONGITUDE)
+        merged = [tuple(r) for r in feed.select(self.data[:300])]
+        self.assertEqual(len(feed.select(self.data[:300])), 0)
+        incremental.merge(merged, [tuple(r) for r in feed.select(self.data)])
+        self.assertEqual(merged, self.selected)
+
+    def testInterpolate(self):
+        start = datetime(2012, 1, 1)
+        values = [nan, nan, 1.0, nan, nan, 4.0, 5.0, nan, nan, nan, 9.0, nan]
+        series = [[start + timedelta(minutes=i), v]
+            for i, v in enumerate(values)]
+        whole = interpolate(series)
+        for sizes in ([1, 1, 1, 1], [3, 4], [6, 2, 1], [11]):
+            feed = incremental.Feed(LATITUDE, LONGITUDE)
+            merged = []
+            for chunk in chunked(series, sizes):
+                incremental.merge(merged, feed.interpolate(chunk))
+            self.assertEqual(merged, whole)
+
+    def testRead(self):
+        feed = incremental.Feed(LATITUDE, LONGITUDE)
+        f = StringIO()
+        f.write('time,irradiance\n2012-01-01 12:00:00-07:00,460\n')
+        f.seek(0)
+        self.assertEqual(len(feed.read(f)), 1)
+        f.write('2012-01-01 12:01:00-07:00,461\n2012-01-01 12:0')
+        f.seek(0)
+        self.assertEqual(list(feed.read(f)['irradiance']), [461])
+        f.write('2:00-07:00,462\n')
+        f.seek(0)
+        self.assertEqual(list(feed.read(f)['irradiance']), [462])
+        f.seek(0)
+        self.assertTrue(feed.read(f) is None)
+
+    def testSaveLoad(self):
+        feed = incremental.Feed(LATITUDE, LONGITUDE)
+        merged = [tuple(r) for r in feed.select(self.data[:250])]
+        saved = StringIO()
+        feed.save(saved)
+        saved.seek(0)
+        feed = incremental.Feed.load(saved)
+        incremental.merge(merged, [tuple(r) for r in feed.select(self.data)])
+        self.assertEqual(merged, self.selected)
+
+
+if __name__ == '__main__':
+    unittest.main()
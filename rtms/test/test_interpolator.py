@@ -127,5 +127,31 @@ class TestInterpolator(unittest.TestCase):
 
 
 
+class TestInterpolateColumn(unittest.TestCase):
+
+    times = [datetime(2012, 1, 1, 0, m) for m in range(5)]
+
+    def assertColumnInterpolated(self, values):
+        expected = interpolator.interpolate(
+            [[t, v] for t, v in zip(self.times, values)])
+        out = interpolator.interpolate_column(self.times, values)
+        self.assertEqual(list(out), [v for t, v in expected])
+
+    def testGaps(self):
+        self.assertColumnInterpolated([nan, 1.0, nan, nan, 4.0])
+        self.assertColumnInterpolated([0.0, nan, 2.0, nan, nan])
+
+    def testAllNaN(self):
+        with self.assertRaises(interpolator.NoValidDataError):
+            interpolator.interpolate_column(self.times, [nan] * 5)
+
+    def testOut(self):
+        out = array([0.0] * 5)
+        result = interpolator.interpolate_column(self.times,
+            [0.0, nan, nan, nan, 4.0], out=out)
+        self.assertTrue(result is out)
+        self.assertEqual(list(out), [0.0, 1.0, 2.0, 3.0, 4.0])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
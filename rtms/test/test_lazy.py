@@ -0,0 +1,78 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import os
+import sys
+import unittest
+from subprocess import check_output
+from nose.plugins.attrib import attr
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+HEAVY = ['yaml', 'rtm', 'fmm', 'dateutil', 'numpy']
+IMPORT_BUDGET = 0.05 # seconds, for the bare package
+
+
+def fresh(code):
+    """run code in a new interpreter, returning what it prints (evaluated)"""
+    return eval(check_output([sys.executable, '-c', code], cwd=ROOT))
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def testPackage(self):
+        loaded = fresh('import sys, rtms\n'
+            'print [m for m in {} if m in sys.modules]'.format(HEAVY))
+        self.assertEqual(loaded, [])
+
+    @attr('slow')
+    def testPackageTime(self):
+        took = fresh('import time; t = time.time()\n'
+            'import rtms\n'
+            'print time.time() - t')
+        self.assertTrue(took < IMPORT_BUDGET, took)
+
+    def testOneStage(self):
+        loaded = fresh('import sys, rtms.selector\n'
+            'print [m for m in {} if m in sys.modules]'.format(HEAVY))
+        self.assertFalse('yaml' in loaded)
+
+    def testImporterAlone(self):
+        loaded = fresh('import sys, rtms.importer\n'
+            'print [m for m in ["fmm", "rtms.optimizer", "rtms.policy"]'
+            ' if m in sys.modules]')
+        self.assertEqual(loaded, [])
+
+    def testDefaultsOnUse(self):
+        before, after = fresh('import sys\n'
+            'from rtms import defaults\n'
+            'before = "yaml" in sys.modules\n'
+            'defaults.limits\n'
+            'print (before, "yaml" in sys.modules)')
+        self.assertEqual((before, after), (False, True))
+
+    def testNames(self):
+        import rtms
+        for name in rtms.__all__:
+            self.assertTrue(getattr(rtms, name) is not None)
+        self.assertRaises(AttributeError, getattr, rtms, 'nothing')
@@ -24,10 +24,12 @@
 import unittest
 from nose.plugins.attrib import attr
 
-from numpy import nan
+from numpy import nan, array
+from numpy.testing import assert_array_equal
 from dateutil import parser as dtp
 from rtm import SMARTS, RTMError
 from .. import optimizer
+from .fakertm import FakeRTM
 
 base = {'latitude': 39.74, 'longitude': 254.82, 'description': 'test'}
 sample = [
@@ -111,5 +113,499 @@ class TestOptimizer(unittest.TestCase):
         rmtree(test_dir_name)
 
 
+class RecordingRTM(FakeRTM):
+    updates = []
+
+    def update(self, settings):
+        RecordingRTM.updates.append(sorted(settings))
+        super(RecordingRTM, self).update(settings)
+
+
+class TestStructuredArray(unittest.TestCase):
+
+    def setUp(self):
+        times = [dtp.parse('2012-01-01 12:0{} -0700'.format(m))
+            for m in range(4)]
+        self.data = array([
+            (times[0], 420.0, 820.0),
+            (times[1], 421.0, 820.0),
+            (times[2], 0.0, 821.0),
+            (times[3], 423.0, 821.0),
+        ], dtype=[('time', object), ('irradiance', float),
+            ('pressure', float)])
+        self.dicts = [{'settings': {'time': row['time'],
+            'pressure': row['pressure']}, 'target': row['irradiance']}
+            for row in self.data]
+
+    def testMatchesDicts(self):
+        self.assertEqual(
+            optimizer.optimize(self.data, base, FakeRTM, aod),
+            optimizer.optimize(self.dicts, base, FakeRTM, aod))
+
+    def testMask(self):
+        mask = self.data['irradiance'] > 0
+        result = optimizer.optimize(self.data, base, FakeRTM, aod, mask=mask)
+        self.assertEqual(result, optimizer.optimize(
+            [d for d, m in zip(self.dicts, mask) if m], base, FakeRTM, aod))
+
+    def testTargetAndNames(self):
+        data = self.data.astype([('time', object), ('measured', float),
+            ('pressure', float)])
+        result = optimizer.optimize(data, base, FakeRTM, aod,
+            target='measured', names=['time'])
+        self.assertEqual(result, optimizer.optimize(self.data[['time',
+            'irradiance']].astype([('time', object), ('irradiance', float)]),
+            base, FakeRTM, aod))
+
+    def testMultiprocessing(self):
+        from multiprocessing import Pool
+        assert_array_equal(
+            optimizer.optimize(self.data, base, FakeRTM, aod, Pool(2).map),
+            optimizer.optimize(self.data, base, FakeRTM, aod))
+
+    def testOnlyChangedSettings(self):
+        RecordingRTM.updates = []
+        optimizer.optimize(self.data[:2], base, RecordingRTM, aod,
+            tolerance=1)
+        point_updates = [u for u in RecordingRTM.updates if u != [aod]]
+        self.assertEqual(point_updates, [['pressure', 'time'], ['time']])
+
+
+class CountingRTM(FakeRTM):
+    built = 0
+
+    def __init__(self, userconfig=None):
+        CountingRTM.built += 1
+        super(CountingRTM, self).__init__(userconfig)
+
+
+class TestModelPool(unittest.TestCase):
+
+    def setUp(self):
+        CountingRTM.built = 0
+        optimizer._local_pools.clear()
+        optimizer._local_models.clear()
+        self.pool = optimizer.ModelPool(CountingRTM, base).local()
+
+    def testReset(self):
+        model = self.pool.acquire({'pressure': 820.0, 'time': 1})
+        model[aod] = 0.3
+        self.pool.release(model)
+        model = self.pool.acquire({'time': 2})
+        self.assertEqual(model, dict(base, time=2))
+
+    def testReuse(self):
+        for t in range(5):
+            self.pool.release(self.pool.acquire({'time': t}))
+        self.assertEqual(CountingRTM.built, 1)
+
+    def testPickle(self):
+        from cPickle import loads, dumps
+        self.pool.release(self.pool.acquire({'time': 1}))
+        copy = loads(dumps(self.pool))
+        self.assertEqual(copy.models, None)
+        self.assertTrue(copy.local() is self.pool)
+
+    def testShared(self):
+        for i in range(5):
+            optimizer.optimize(sample, base, CountingRTM, aod)
+        self.assertEqual(len(optimizer._local_pools), 1)
+        self.assertEqual(CountingRTM.built, 1)
+
+    def testBounded(self):
+        keep = optimizer._local_pools.keep
+        for t in range(keep + 20):
+            optimizer.ModelPool(CountingRTM, dict(base, time=t)).local()
+        self.assertEqual(len(optimizer._local_pools), keep)
+
+    def testSharedModels(self):
+        # pools for different bases use the same models
+        CountingRTM.built = 0
+        pools = [optimizer.ModelPool(CountingRTM, dict(base, time=t)).local()
+            for t in range(20)]
+        self.assertEqual(len(optimizer._local_models), 1)
+        self.assertEqual(len(pools[0].models.free), 1)
+        for pool in pools + pools:
+            model = pool.acquire()
+            self.assertEqual(model, pool.snapshot)
+            pool.release(model)
+        self.assertEqual(CountingRTM.built, 20)
+
+    def testNoLeaks(self):
+        cloudy = dict(sample[0], settings=dict(sample[0]['settings'],
+            cloud_optical_depth=5))
+        self.assertEqual(
+            optimizer.optimize([cloudy, sample[1]], base, FakeRTM, aod)[1],
+            optimizer.optimize(sample[1:], base, FakeRTM, aod)[0])
+
+
+def day_of_points(n=60):
+    """points through a day, at known aods"""
+    from random import Random
+    from datetime import timedelta
+    random = Random(1)
+    start = dtp.parse('2012-06-01 08:00 -0700')
+    points = []
+    for i in range(n):
+        settings = {'time': start + timedelta(minutes=8 * i)}
+        model = FakeRTM(dict(base, **settings))
+        model[aod] = random.uniform(0.05, 0.6)
+        points.append({'settings': settings,
+            'target': model.irradiance['global']})
+    return points
+
+
+class TestSurrogate(unittest.TestCase):
+
+    def setUp(self):
+        self.points = day_of_points()
+        self.expected = optimizer.optimize(self.points, base, FakeRTM, aod,
+            tolerance=0.001)
+
+    def testWarmedUp(self):
+        surrogate = optimizer.Surrogate()
+        optimizer.optimize(self.points[:10], base, FakeRTM, aod,
+            tolerance=0.001, surrogate=surrogate)
+        FakeRTM.evaluations = 0
+        result = optimizer.optimize(self.points, base, FakeRTM, aod,
+            tolerance=0.001, surrogate=surrogate)
+        self.assertTrue(FakeRTM.evaluations <= 3 * len(self.points))
+        for r, e in zip(result, self.expected):
+            self.assertAlmostEqual(r, e, delta=0.002)
+
+    def testFallback(self):
+        surrogate = optimizer.Surrogate(warmup=1)
+        surrogate.samples = [([1, 0, 0, 0], 0.9)] * 5 # confidently wrong
+        result = optimizer.optimize(self.points[:3], base, FakeRTM, aod,
+            tolerance=0.001, surrogate=surrogate)
+        for r, e in zip(result, self.expected):
+            self.assertAlmostEqual(r, e, delta=0.002)
+
+    def testColumns(self):
+        surrogate = optimizer.Surrogate(columns=['pressure'], warmup=1)
+        model = FakeRTM(dict(base, pressure=820.0, **self.points[0]['settings']))
+        surrogate.learn(model, 500, {0.1: 20, 0.2: -30})
+        self.assertEqual(len(surrogate.samples[0][0]), 5)
+        self.assertEqual(surrogate.samples[0][0][-1], 820.0)
+
+    def testBounded(self):
+        surrogates = [optimizer.Surrogate() for i in range(20)]
+        for surrogate in surrogates:
+            self.assertTrue(surrogate.local() is surrogate)
+        self.assertEqual(len(optimizer._local_surrogates),
+            optimizer._local_surrogates.keep)
+        self.assertTrue(surrogates[-1].local() is surrogates[-1])
+
+
+class TestDedup(unittest.TestCase):
+
+    def setUp(self):
+        from datetime import timedelta
+        self.points = []
+        for point in sample:
+            for jitter in range(3):
+                settings = dict(point['settings'], pressure=820 + jitter / 10.)
+                settings['time'] += timedelta(seconds=jitter * 5)
+                self.points.append({'settings': settings,
+                    'target': point['target'] + jitter / 100.})
+
+    def testOncePerGroup(self):
+        FakeRTM.evaluations = 0
+        exact = optimizer.optimize(self.points, base, FakeRTM, aod)
+        runs = FakeRTM.evaluations
+        FakeRTM.evaluations = 0
+        result = optimizer.optimize(self.points, base, FakeRTM, aod,
+            precision={'time': 60, 'pressure': 1, 'irradiance': 1})
+        self.assertEqual(FakeRTM.evaluations, runs / 3)
+        self.assertEqual(result, [exact[0]] * 3 + [exact[3]] * 3)
+
+    def testOnlyListed(self):
+        FakeRTM.evaluations = 0
+        optimizer.optimize(self.points, base, FakeRTM, aod,
+            precision={'time': 60, 'irradiance': 1})
+        runs = FakeRTM.evaluations
+        FakeRTM.evaluations = 0
+        optimizer.optimize(self.points, base, FakeRTM, aod)
+        self.assertEqual(runs, FakeRTM.evaluations)
+
+    def testBatches(self):
+        result = optimizer.optimize(self.points, base, FakeRTM, aod,
+            batch_size=2, spread=0.1,
+            precision={'time': 60, 'pressure': 1, 'irradiance': 1})
+        self.assertEqual(result, [result[0]] * 3 + [result[3]] * 3)
+
+
+class TestUncertainty(unittest.TestCase):
+
+    def setUp(self):
+        self.points = day_of_points(20)
+
+    def testFewerEvaluations(self):
+        FakeRTM.evaluations = 0
+        optimizer.optimize(self.points, base, FakeRTM, aod, tolerance=0.001)
+        runs = FakeRTM.evaluations
+        FakeRTM.evaluations = 0
+        optimizer.optimize(self.points, base, FakeRTM, aod, tolerance=0.001,
+            uncertainty=optimizer.Uncertainty(10, 0.02))
+        self.assertTrue(FakeRTM.evaluations < runs)
+
+    def testWithinUncertainty(self):
+        uncertainty = optimizer.Uncertainty(10, 0.02)
+        result = optimizer.optimize(self.points, base, FakeRTM, aod,
+            tolerance=0.001, uncertainty=uncertainty)
+        for point, x in zip(self.points, result):
+            model = FakeRTM(dict(base, **point['settings']))
+            model[aod] = x
+            error = model.irradiance['global'] - point['target']
+            self.assertTrue(abs(error) <= uncertainty(point['target']))
+
+    def testScale(self):
+        uncertainty = optimizer.Uncertainty(5, 0.1)
+        self.assertEqual(uncertainty(100), 15)
+        self.assertEqual(uncertainty(-100), 15)
+
+
+class TestComponents(unittest.TestCase):
+
+    def setUp(self):
+        points = day_of_points(5)
+        self.data = array([(p['settings']['time'], p['target'], 0.0)
+            for p in points], dtype=[('time', object), ('irradiance', float),
+            ('direct', float)])
+        self.aods = []
+        for row in self.data:
+            model = FakeRTM(dict(base, time=row['time']))
+            model[aod] = 0.9 # the direct sensor sees a much hazier sky
+            row['direct'] = model.irradiance['direct']
+
+    def testIrradianceComponent(self):
+        direct = optimizer.optimize(self.data, base, FakeRTM, aod,
+            irradiance='direct', target='direct', names=['time'],
+            tolerance=0.001)
+        for x in direct:
+            self.assertAlmostEqual(x, 0.9, delta=0.002)
+
+    def testOnePass(self):
+        FakeRTM.evaluations = 0
+        plain = optimizer.optimize(self.data, base, FakeRTM, aod,
+            tolerance=0.001, names=['time'], bounds=(0, 2))
+        runs = FakeRTM.evaluations
+        FakeRTM.evaluations = 0
+        result = optimizer.optimize(self.data, base, FakeRTM, aod,
+            tolerance=0.001, components={'direct': 'direct'}, bounds=(0, 2))
+        self.assertEqual(FakeRTM.evaluations, runs)
+        for x, (answer, outputs) in zip(plain, result):
+            self.assertEqual(x, answer)
+            components = outputs['components']
+            self.assertAlmostEqual(components['global']['x'], x, delta=0.002)
+            self.assertAlmostEqual(components['direct']['x'], 0.9,
+                delta=0.05)
+            self.assertTrue(components['direct']['residual'] > 0)
+
+    def testDictTargets(self):
+        points = [{'settings': {'time': row['time']},
+            'target': {'global': row['irradiance'], 'direct': row['direct']}}
+            for row in self.data]
+        result = optimizer.optimize(points, base, FakeRTM, aod,
+            outputs=['components'], bounds=(0, 2))
+        self.assertEqual([r[0] for r in result], optimizer.optimize(
+            self.data, base, FakeRTM, aod, names=['time'], bounds=(0, 2)))
+
+
+class Counted(object):
+    """an iterable that keeps track of how far it's been read"""
+
+    def __init__(self, items):
+        self.items = items
+        self.taken = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.taken += 1
+            yield item
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        self.points = day_of_points(30)
+        self.expected = optimizer.optimize(self.points, base, FakeRTM, aod)
+
+    def testInOrder(self):
+        results = optimizer.ioptimize(iter(self.points), base, FakeRTM, aod)
+        self.assertFalse(isinstance(results, list))
+        self.assertEqual(list(results), self.expected)
+
+    def testOnlyAsNeeded(self):
+        points = Counted(self.points)
+        results = optimizer.ioptimize(points, base, FakeRTM, aod)
+        next(results)
+        self.assertEqual(points.taken, 1)
+
+    def testWindow(self):
+        from multiprocessing import Pool
+        points = Counted(self.points)
+        results = optimizer.ioptimize(points, base, FakeRTM, aod,
+            pool=Pool(2), window=4)
+        self.assertEqual(next(results), self.expected[0])
+        self.assertEqual(points.taken, 4)
+        assert_array_equal([self.expected[0]] + list(results), self.expected)
+
+    def testBatches(self):
+        from multiprocessing import Pool
+        points = Counted(self.points)
+        results = optimizer.ioptimize(points, base, FakeRTM, aod,
+            pool=Pool(2), window=2, batch_size=4, spread=0.1)
+        next(results)
+        self.assertEqual(points.taken, 8)
+        assert_array_equal([r for r in results], optimizer.optimize(
+            self.points, base, FakeRTM, aod, batch_size=4, spread=0.1)[1:])
+
+
+class SleepyRTM(FakeRTM):
+    """takes longer with the sun low, like the real models"""
+
+    @property
+    def irradiance(self):
+        from time import sleep
+        sleep(0.002 * optimizer.low_sun_cost(self, None))
+        return super(SleepyRTM, self).irradiance
+
+
+def makespan(*args, **kwargs):
+    from time import time
+    start = time()
+    result = optimizer.optimize(*args, **kwargs)
+    return time() - start, result
+
+
+class TestScheduling(unittest.TestCase):
+
+    def setUp(self):
+        self.points = day_of_points(40)
+
+    def testOrder(self):
+        seen = []
+
+        def recording_map(func, things):
+            seen.extend(thing[0]['time'] for thing in things)
+            return map(func, things)
+
+        result = optimizer.optimize(self.points, base, FakeRTM, aod,
+            recording_map, cost=optimizer.low_sun_cost)
+        self.assertEqual(result, optimizer.optimize(self.points, base,
+            FakeRTM, aod))
+        costs = [optimizer.low_sun_cost(dict(base, time=t), None)
+            for t in seen]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+
+    def testPool(self):
+        from multiprocessing import Pool
+        pool = Pool(2)
+        assert_array_equal(
+            optimizer.optimize(self.points, base, FakeRTM, aod, pool.imap,
+                batch_size=3, spread=0.1, cost=optimizer.low_sun_cost),
+            optimizer.optimize(self.points, base, FakeRTM, aod,
+                batch_size=3, spread=0.1))
+        pool.close()
+
+    @attr('slow')
+    def testMakespan(self):
+        from multiprocessing import Pool
+        pool = Pool(4)
+        points = day_of_points(85)  # 08:00 to sundown
+        naive, expected = makespan(points, base, SleepyRTM, aod, pool.map)
+        scheduled, result = makespan(points, base, SleepyRTM, aod, pool.imap,
+            cost=optimizer.low_sun_cost)
+        pool.close()
+        print 'time order, Pool.map: {:.2f}s; longest first, Pool.imap: ' \
+            '{:.2f}s'.format(naive, scheduled)
+        self.assertEqual(result, expected)
+        self.assertTrue(scheduled < naive)
+
+
+class TestOutputs(unittest.TestCase):
+
+    sample = [
+        {'settings': {'time': dtp.parse('2012-01-01 12:00 -0700')},
+         'target': 420},
+        {'settings': {'time': dtp.parse('2012-01-01 00:00 -0700')},
+         'target': 420},
+    ]
+
+    def testOutputs(self):
+        result = optimizer.optimize(self.sample, base, FakeRTM, aod,
+            tolerance=0.0001, outputs=['irradiance', 'spectrum'])
+        value, outputs = result[0]
+        self.assertAlmostEqual(outputs['irradiance']['global'], 420, 0)
+        model = FakeRTM(base)
+        model.update(self.sample[0]['settings'])
+        model.update({aod: value})
+        self.assertEqual(outputs['irradiance'], model.irradiance)
+        self.assertTrue((outputs['spectrum'] == model.spectrum).all())
+        self.assertTrue(result[1][0] is nan)
+        self.assertTrue(result[1][1] is None)
+
+    def testAtMostOneExtraEvaluation(self):
+        FakeRTM.evaluations = 0
+        optimizer.optimize(self.sample[:1], base, FakeRTM, aod)
+        without = FakeRTM.evaluations
+        FakeRTM.evaluations = 0
+        optimizer.optimize(self.sample[:1], base, FakeRTM, aod,
+            outputs=['irradiance'])
+        self.assertLessEqual(FakeRTM.evaluations, without + 1)
+
+
+class TestCloudOptimizer(unittest.TestCase):
+
+    times = ['2012-01-01 12:{:02d} -0700'.format(m) for m in range(6)]
+    clouds = [1.0, 1.5, 2.0, 8.0, 8.5, 9.0]
+    aod = 0.1
+
+    def makeSample(self, clouds):
+        sample = []
+        for time, cloud in zip(self.times, clouds):
+            model = FakeRTM(base)
+            model.update({'time': dtp.parse(time), aod: self.aod,
+                'cloud_optical_depth': cloud})
+            sample.append({'settings': {'time': dtp.parse(time)},
+                'target': model.irradiance['global']})
+        return sample
+
+    def testClouds(self):
+        sample = self.makeSample(self.clouds)
+        result = optimizer.optimize_clouds(sample, [self.aod] * len(sample),
+            base, FakeRTM, tolerance=0.001, batch_size=3)
+        for exp, res in zip(self.clouds, result):
+            self.assertAlmostEqual(exp, res, 2)
+
+    def testMissingAOD(self):
+        sample = self.makeSample(self.clouds[:2])
+        result = optimizer.optimize_clouds(sample, [nan, self.aod], base,
+            FakeRTM, tolerance=0.001)
+        self.assertTrue(result[0] is nan)
+        self.assertAlmostEqual(self.clouds[1], result[1], 2)
+
+    def testWarmStartSavesEvaluations(self):
+        sample = self.makeSample(self.clouds)
+        aods = [self.aod] * len(sample)
+        FakeRTM.evaluations = 0
+        optimizer.optimize_clouds(sample, aods, base, FakeRTM,
+            tolerance=0.001, batch_size=1)
+        cold = FakeRTM.evaluations
+        FakeRTM.evaluations = 0
+        optimizer.optimize_clouds(sample, aods, base, FakeRTM,
+            tolerance=0.001, batch_size=len(sample))
+        self.assertLess(FakeRTM.evaluations, cold)
+
+    def testMultiprocessing(self):
+        from multiprocessing import Pool
+        sample = self.makeSample(self.clouds)
+        result = optimizer.optimize_clouds(sample, [self.aod] * len(sample),
+            base, FakeRTM, Pool(2).map, tolerance=0.001, batch_size=2)
+        for exp, res in zip(self.clouds, result):
+            self.assertAlmostEqual(exp, res, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import unittest
+from itertools import imap
+from time import sleep, time
+from numpy import isnan
+from dateutil import parser as dtp
+from fmm import NoConvergeError
+from rtm._rtm import CallableDict
+from .. import optimizer
+from ..policy import Policy, FailureBudgetError
+from .fakertm import FakeRTM
+from .test_optimizer import base, sample, aod
+
+
+def _slowly(value, seconds):
+    def get():
+        sleep(seconds)
+        return value
+    return get
+
+
+class SlowRTM(FakeRTM):
+    """
+    hangs for hazy skies. like the real models, the run only happens when a
+    component is read.
+    """
+
+    @property
+    def irradiance(self):
+        seconds = 5 if self.get(aod, 0) > 0.5 else 0.02
+        return CallableDict((k, _slowly(v, seconds)) for k, v in
+            super(SlowRTM, self).irradiance.items())
+
+
+class StuckRTM(FakeRTM):
+
+    @property
+    def irradiance(self):
+        raise NoConvergeError('stuck')
+
+
+night = {'settings': {'time': dtp.parse('2012-01-01 00:00 -0700')},
+    'target': 420}
+
+
+class TestTimeouts(unittest.TestCase):
+
+    def testEvaluation(self):
+        start = time()
+        result = optimizer.optimize(sample[:1], base, SlowRTM, aod,
+            policy=Policy(eval_timeout=0.1))
+        self.assertTrue(isnan(result[0]))
+        self.assertTrue(time() - start < 1)
+
+    def testPoint(self):
+        start = time()
+        result = optimizer.optimize(sample[:1], base, SlowRTM, aod,
+            bounds=(0, 0.5), tolerance=0.0001,
+            policy=Policy(point_timeout=0.05))
+        self.assertTrue(isnan(result[0]))
+        self.assertTrue(time() - start < 1)
+
+    def testLazyOutputs(self):
+        point = dict(sample[0], target=500) # not hazy; no time limit hit
+        [(value, outputs)] = optimizer.optimize([point], base, SlowRTM,
+            aod, bounds=(0, 0.5), outputs=['irradiance'],
+            policy=Policy(eval_timeout=1))
+        self.assertFalse(isnan(value))
+        self.assertEqual(sorted(outputs['irradiance']),
+            ['diffuse', 'direct', 'global'])
+
+    def testInTime(self):
+        self.assertEqual(
+            optimizer.optimize(sample, base, FakeRTM, aod,
+                policy=Policy(eval_timeout=1, point_timeout=5)),
+            optimizer.optimize(sample, base, FakeRTM, aod))
+
+
+class TestRetries(unittest.TestCase):
+
+    def testNotBracketed(self):
+        result = optimizer.optimize(sample, base, FakeRTM, aod,
+            bounds=(0, 0.2))
+        self.assertTrue(all(isnan(r) for r in result))
+
+    def testWidened(self):
+        self.assertEqual(
+            optimizer.optimize(sample, base, FakeRTM, aod, bounds=(0, 0.2),
+                policy=Policy(retries=2)),
+            optimizer.optimize(sample, base, FakeRTM, aod, bounds=(0, 0.8)))
+
+    def testNoConverge(self):
+        result = optimizer.optimize(sample, base, StuckRTM, aod)
+        self.assertTrue(all(isnan(r) for r in result))
+
+
+class TestFailureBudget(unittest.TestCase):
+
+    def testAbort(self):
+        with self.assertRaises(FailureBudgetError) as caught:
+            optimizer.optimize([night] * 3 + sample, base, FakeRTM, aod,
+                policy=Policy(failures=1))
+        self.assertEqual(len(caught.exception.results), 2)
+
+    def testDegrade(self):
+        FakeRTM.evaluations = 0
+        result = optimizer.optimize([night] * 3 + sample, base, FakeRTM, aod,
+            imap, policy=Policy(failures=1, abort=False))
+        self.assertEqual(len(result), 5)
+        self.assertTrue(all(isnan(r) for r in result))
+        self.assertEqual(FakeRTM.evaluations, 2)
+
+    def testFraction(self):
+        result = optimizer.optimize([night] + sample, base, FakeRTM, aod,
+            policy=Policy(failures=0.5))
+        self.assertEqual(result[1:], optimizer.optimize(sample, base,
+            FakeRTM, aod))
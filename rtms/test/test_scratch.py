@@ -0,0 +1,183 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import os
+import unittest
+from cPickle import loads, dumps
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+from nose.plugins.attrib import attr
+from numpy.testing import assert_array_equal
+from .. import optimizer, stations
+from ..scratch import Scratch
+from .fakertm import FileRTM
+from .test_optimizer import base, sample, aod, day_of_points
+
+
+class TestScratch(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = Scratch()
+
+    def tearDown(self):
+        self.scratch.close()
+
+    def testClear(self):
+        path = self.scratch.worker()
+        os.makedirs(os.path.join(path, 'run', 'deck'))
+        open(os.path.join(path, 'out.txt'), 'w').close()
+        self.scratch.clear()
+        self.assertEqual(os.listdir(path), [])
+        self.assertEqual(self.scratch.worker(), path)
+
+    def testOneDirectoryPerWorker(self):
+        self.assertEqual(self.scratch.worker(), self.scratch.worker())
+        copy = loads(dumps(self.scratch))
+        self.assertEqual(copy.root, self.scratch.root)
+        self.assertEqual(copy.worker(), self.scratch.worker())
+        self.assertEqual(len(os.listdir(self.scratch.root)), 1)
+
+    def testClose(self):
+        open(os.path.join(self.scratch.worker(), 'deck'), 'w').close()
+        self.scratch.close()
+        self.assertFalse(os.path.exists(self.scratch.root))
+
+
+class TestOptimizeInScratch(unittest.TestCase):
+
+    def testSameAnswers(self):
+        FileRTM.dirs_made = 0
+        expected = optimizer.optimize(sample, base, FileRTM, aod)
+        made = FileRTM.dirs_made
+        with Scratch() as scratch:
+            result = optimizer.optimize(sample, base, FileRTM, aod,
+                scratch=scratch)
+        self.assertEqual(result, expected)
+        self.assertEqual(FileRTM.dirs_made, made)
+
+    def testCleared(self):
+        # each point's run directories are gone once it's done
+        seen = []
+
+        class Watched(FileRTM):
+            def _run(self, path):
+                seen.append(len(os.listdir(self.target)))
+                return super(Watched, self)._run(path)
+
+        with Scratch() as scratch:
+            optimizer.optimize(sample * 3, base, Watched, aod,
+                scratch=scratch)
+            self.assertEqual(os.listdir(scratch.worker()), [])
+        self.assertTrue(max(seen) < len(seen)) # only ever one point's worth
+
+    def testWorkers(self):
+        from multiprocessing import Pool
+        FileRTM.dirs_made = 0
+        with Scratch() as scratch:
+            result = optimizer.optimize(sample * 4, base, FileRTM, aod,
+                Pool(2).map, scratch=scratch)
+            self.assertTrue(len(os.listdir(scratch.root)) <= 2)
+        assert_array_equal(result, optimizer.optimize(sample * 4, base,
+            FileRTM, aod))
+
+    def testManyStations(self):
+        # more stations than a worker keeps pools for: still one directory
+        # per worker
+        from multiprocessing import Pool
+        many = [stations.Station(str(i), dict(base, description=str(i)),
+            sample) for i in range(40)]
+        with Scratch() as scratch:
+            results = stations.optimize_stations(many, FileRTM, aod,
+                Pool(2).imap, scratch=scratch)
+            self.assertTrue(len(os.listdir(scratch.root)) <= 2)
+        self.assertEqual(results, [optimizer.optimize(sample, base, FileRTM,
+            aod)] * len(many))
+
+
+class TimedRTM(FileRTM):
+    """FileRTM, adding up the time spent on its files"""
+
+    io_time = 0
+    target_dir = None # where to work without a scratch, like the default '.'
+
+    def __init__(self, userconfig=None):
+        super(TimedRTM, self).__init__(userconfig)
+        self.target = TimedRTM.target_dir
+
+    @property
+    def irradiance(self):
+        start = time()
+        try:
+            return super(TimedRTM, self).irradiance
+        finally:
+            TimedRTM.io_time += time() - start
+
+
+class TimedScratch(Scratch):
+    """Scratch, adding the time spent clearing to TimedRTM's"""
+
+    def clear(self):
+        start = time()
+        try:
+            super(TimedScratch, self).clear()
+        finally:
+            TimedRTM.io_time += time() - start
+
+
+@attr('slow')
+class TestScratchIO(unittest.TestCase):
+    """
+    the file work of a run, in the backends' own target directory (removed
+    once, at the end) and in a scratch cleared point by point. the backends
+    make a new directory for every evaluation, so decks can't be rewritten
+    in place from here; clearing as we go mustn't cost more than leaving it
+    all to the end, and tmpfs should save time. see the times with
+    nosetests -s.
+    """
+
+    def io(self, scratch=None):
+        TimedRTM.io_time = 0
+        optimizer.optimize(self.points, base, TimedRTM, aod,
+            tolerance=0.001, scratch=scratch)
+        return TimedRTM.io_time
+
+    def testIOTime(self):
+        self.points = day_of_points() * 4
+        TimedRTM.target_dir = mkdtemp(prefix='rtms-test-')
+        try:
+            left = self.io()
+        finally:
+            start = time() # it has to go some time
+            rmtree(TimedRTM.target_dir)
+            left += time() - start
+            TimedRTM.target_dir = None
+        with TimedScratch() as scratch:
+            cleared = self.io(scratch)
+        with TimedScratch(tmpfs=True) as scratch:
+            in_memory = self.io(scratch)
+        print 'file work: left behind {:.3f}s, scratch {:.3f}s, ' \
+            'tmpfs scratch {:.3f}s'.format(left, cleared, in_memory)
+        self.assertTrue(cleared < 2 * left)
+        self.assertTrue(in_memory < left)
@@ -21,13 +21,16 @@
     along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import os.path
 import unittest
 from datetime import datetime
 from dateutil import parser as dt
-from .. import selector
+from .. import selector, importer
 
 LATITUDE = 39.74 # degrees north
 LONGITUDE = 254.82 # degrees east
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', '..', 'example',
+    'real_example', 'time-series-short.csv')
 
 
 class TestSelector(unittest.TestCase):
@@ -150,5 +153,133 @@ class TestSelector(unittest.TestCase):
         self.assertDetected(irr_data, expected)
 
 
+def example_data():
+    data = importer.data(open(EXAMPLE),
+        {'time': 'DateTime', 'irradiance': 'GlobalCM22'})
+    return data[['time', 'irradiance']].astype(
+        [('time', object), ('irradiance', float)])
+
+
+class TestCriteria(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = example_data()
+        cls.criteria = selector.Selector(LATITUDE, LONGITUDE).criteria(
+            cls.data)
+
+    def assertSameAsSelect(self, night, change, kt_min):
+        select = selector.Selector(LATITUDE, LONGITUDE, night, change, kt_min)
+        expected = select.select(self.data)['clear']
+        self.assertEqual(list(self.criteria.clear(night, change, kt_min)),
+            list(expected))
+
+    def testDefaults(self):
+        self.assertSameAsSelect(selector.NIGHT_CONST, selector.CHANGE_CONST,
+            None)
+
+    def testThresholds(self):
+        self.assertSameAsSelect(50, 3, None)
+        self.assertSameAsSelect(5, 10, None)
+
+    def testKt(self):
+        self.assertSameAsSelect(selector.NIGHT_CONST, selector.CHANGE_CONST,
+            selector.Kt_MIN)
+        loose = self.criteria.clear()
+        strict = self.criteria.clear(kt_min=0.9)
+        self.assertTrue((loose >= strict).all())
+        self.assertTrue(loose.sum() > strict.sum())
+
+    def testSweep(self):
+        masks = self.criteria.sweep(changes=[3, 6], kt_mins=[None, 0.5])
+        self.assertEqual(sorted(masks), [(12, 3, None), (12, 3, 0.5),
+            (12, 6, None), (12, 6, 0.5)])
+        self.assertEqual(list(masks[(12, 6, None)]),
+            list(self.criteria.clear()))
+
+    def testSmallCases(self):
+        select = selector.Selector(LATITUDE, LONGITUDE)
+        for rows in ([0, 1], [0, 2], [0, 1, 2], [0, 1, 2, 3]):
+            data = self.data[[r + 600 for r in rows]]
+            self.assertEqual(list(select.criteria(data).clear()),
+                list(select.select(data)['clear']))
+
+
+class TestGaps(unittest.TestCase):
+
+    def setUp(self):
+        from numpy import array
+        self.data = array([
+            (dt.parse('01/01/2012 12:00 -0700'), 500.0),
+            (dt.parse('01/01/2012 12:01 -0700'), 501.0),
+            (dt.parse('01/01/2012 12:20 -0700'), 800.0), # after a gap
+            (dt.parse('01/01/2012 12:21 -0700'), 801.0),
+        ], dtype=[('time', object), ('irradiance', float)])
+
+    def assertClear(self, select, expected):
+        self.assertEqual(list(select.select(self.data)['clear']), expected)
+        self.assertEqual(list(select.criteria(self.data).clear(select.night,
+            select.change)), expected)
+        self.assertEqual(list(select.select_parallel(self.data,
+            chunk_size=2)['clear']), expected)
+
+    def testSpansGap(self):
+        self.assertClear(selector.Selector(LATITUDE, LONGITUDE),
+            [True, False, False, True])
+
+    def testSplitAtGap(self):
+        self.assertClear(selector.Selector(LATITUDE, LONGITUDE, gap=5),
+            [True, True, True, True])
+
+    def testOvernight(self):
+        # the first row of a day isn't compared to the last of the day before
+        data = example_data()
+        days = (data['irradiance'] >= selector.NIGHT_CONST).nonzero()[0]
+        select = selector.Selector(LATITUDE, LONGITUDE)
+        criteria = select.criteria(data)
+        first = days[1:][criteria.minutes[days[1:]] -
+            criteria.minutes[days[:-1]] > select.gap]
+        self.assertTrue(len(first))
+        self.assertEqual(list(criteria.clear()),
+            list(select.select(data)['clear']))
+
+
+class TestSelectParallel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = example_data()
+        select = selector.Selector(LATITUDE, LONGITUDE)
+        cls.expected = list(select.select(cls.data)['clear'])
+
+    def assertSameAsSelect(self, data, expected, **kwargs):
+        select = selector.Selector(LATITUDE, LONGITUDE)
+        out = select.select_parallel(data, **kwargs)
+        self.assertEqual(list(out['clear']), expected)
+
+    def testChunkSizes(self):
+        for chunk_size in (1, 2, 7, 100, 1440, 5000):
+            self.assertSameAsSelect(self.data, self.expected,
+                chunk_size=chunk_size)
+
+    def testNightChunks(self):
+        # chunks of night only, and daytime chunks with night between them
+        data = self.data[::5]
+        expected = list(selector.Selector(LATITUDE, LONGITUDE).select(
+            data)['clear'])
+        for chunk_size in (3, 50):
+            self.assertSameAsSelect(data, expected, chunk_size=chunk_size)
+
+    def testPool(self):
+        from multiprocessing import Pool
+        self.assertSameAsSelect(self.data, self.expected,
+            map_func=Pool(2).map, chunk_size=500)
+
+    def testTooShort(self):
+        with self.assertRaises(selector.InsufficientDataError):
+            selector.Selector(LATITUDE, LONGITUDE).select_parallel(
+                self.data[:1])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from dateutil import parser as dtp
+from numpy import isnan, float32, trapz
+from .. import spectrum, optimizer
+from .fakertm import FakeRTM
+
+base = {'latitude': 39.74, 'longitude': 254.82, 'description': 'test'}
+noon = dtp.parse('2012-01-01 12:00 -0700')
+midnight = dtp.parse('2012-01-01 00:00 -0700')
+
+
+class TestSpectrum(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'spectra.npy')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testSpectra(self):
+        settings_list = [
+            {'time': noon, 'angstroms_coefficient': 0.1},
+            {'time': noon, 'angstroms_coefficient': 0.2},
+        ]
+        spectrum.spectra(settings_list, base, FakeRTM, self.path)
+        wavelength, spectra = spectrum.load(self.path)
+        self.assertEqual(spectra.shape, (2, len(FakeRTM.wavelength)))
+        self.assertEqual(spectra.dtype, float32)
+        model = FakeRTM(base)
+        for settings, row in zip(settings_list, spectra):
+            model.update(settings)
+            self.assertAlmostEqual(trapz(row, wavelength),
+                model.irradiance['global'], 1)
+
+    def testFailedRows(self):
+        settings_list = [{'time': midnight}, {'time': noon}, {'time': midnight}]
+        spectrum.spectra(settings_list, base, FakeRTM, self.path)
+        wavelength, spectra = spectrum.load(self.path)
+        self.assertTrue(isnan(spectra[0]).all())
+        self.assertFalse(isnan(spectra[1]).any())
+        self.assertTrue(isnan(spectra[2]).all())
+
+    def testAllFailed(self):
+        spectrum.spectra([{'time': midnight}], base, FakeRTM, self.path)
+        wavelength, spectra = spectrum.load(self.path)
+        self.assertEqual(spectra.shape, (1, 0))
+
+    def testMismatchedWavelengths(self):
+        with self.assertRaises(ValueError):
+            spectrum.write([(float32([1, 2]), [1, 1]),
+                (float32([1, 3]), [1, 1])], self.path, 2)
+
+    def testFromOptimized(self):
+        sample = [{'settings': {'time': t}, 'target': 420}
+            for t in (noon, midnight)]
+        results = optimizer.optimize(sample, base, FakeRTM,
+            'angstroms_coefficient', tolerance=0.0001, outputs=['spectrum'])
+        spectrum.from_optimized(results, self.path, len(results))
+        wavelength, spectra = spectrum.load(self.path)
+        self.assertAlmostEqual(trapz(spectra[0], wavelength), 420, 0)
+        self.assertTrue(isnan(spectra[1]).all())
+
+    def testMultiprocessing(self):
+        from multiprocessing import Pool
+        settings_list = [{'time': noon}] * 4
+        spectrum.spectra(settings_list, base, FakeRTM, self.path,
+            Pool(2).imap)
+        wavelength, spectra = spectrum.load(self.path)
+        self.assertFalse(isnan(spectra).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os.path
+import unittest
+from dateutil import parser as dtp
+from .. import stations, optimizer
+from .fakertm import FakeRTM
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', '..', 'example',
+    'real_example')
+aod = 'angstroms_coefficient'
+
+
+def points(times, target):
+    return [{'settings': {'time': dtp.parse(t)}, 'target': target}
+        for t in times]
+
+
+class TestStations(unittest.TestCase):
+
+    def setUp(self):
+        self.stations = [
+            stations.Station('long', {'latitude': 39.74, 'longitude': 254.82,
+                'description': 'long'}, points(['2012-01-01 12:00 -0700',
+                '2012-01-01 12:01 -0700', '2012-01-01 12:02 -0700'], 420)),
+            stations.Station('short', {'latitude': 44.23, 'longitude': 283.5,
+                'description': 'short'}, points(['2012-06-01 12:00 -0500'],
+                900)),
+        ]
+
+    def testRoundRobin(self):
+        self.assertEqual(list(stations._round_robin([['a', 'b', 'c'], ['d']])),
+            [(0, 0, 'a'), (1, 0, 'd'), (0, 1, 'b'), (0, 2, 'c')])
+
+    def testMatchesSeparateRuns(self):
+        results = stations.optimize_stations(self.stations, FakeRTM, aod)
+        self.assertEqual(len(results), 2)
+        for station, result in zip(self.stations, results):
+            self.assertEqual(result, optimizer.optimize(station.points,
+                station.info, FakeRTM, aod))
+
+    def testOptions(self):
+        # everything optimize can do, stations can do too
+        for kwargs in ({'irradiance': 'direct'}, {'batch_size': 2,
+            'spread': 0.1}, {'cost': optimizer.low_sun_cost},
+            {'precision': {'time': 120}}):
+            results = stations.optimize_stations(self.stations, FakeRTM, aod,
+                **kwargs)
+            for station, result in zip(self.stations, results):
+                self.assertEqual(result, optimizer.optimize(station.points,
+                    station.info, FakeRTM, aod, **kwargs))
+        self.assertNotEqual(stations.optimize_stations(self.stations,
+            FakeRTM, aod, irradiance='direct'),
+            stations.optimize_stations(self.stations, FakeRTM, aod))
+
+    def testSharedPool(self):
+        from multiprocessing import Pool
+        pool = Pool(2)
+        results = stations.optimize_stations(self.stations, FakeRTM, aod,
+            pool.imap)
+        self.assertEqual(results, stations.optimize_stations(self.stations,
+            FakeRTM, aod))
+
+    def testLoad(self):
+        station = stations.load(os.path.join(EXAMPLE, 'config.yaml'),
+            os.path.join(EXAMPLE, 'time-series-short.csv'))
+        self.assertEqual(station.name, 'NREL BMS')
+        self.assertTrue(station.points)
+        point = station.points[0]
+        self.assertTrue('pressure' in point['settings'])
+        self.assertFalse('irradiance' in point['settings'])
+        self.assertFalse('clear' in point['settings'])
+
+
+if __name__ == '__main__':
+    unittest.main()
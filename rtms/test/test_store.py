@@ -0,0 +1,135 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import unittest
+from datetime import datetime, timedelta
+from shutil import rmtree
+from tempfile import mkdtemp
+from numpy import empty, nan, arange
+from numpy.testing import assert_array_equal
+from dateutil import parser as dtp
+from dateutil.tz import tzutc
+from ..store import Store, RECORD
+from ..cleaner import epoch
+from ..table import DERIVED
+
+
+def results(start, n, step=timedelta(hours=1), offset=0.0):
+    rows = empty(n, dtype=[('time', object)] + DERIVED)
+    rows['time'] = [start + step * i for i in range(n)]
+    rows['clear'] = arange(n) % 2 == 0
+    rows['optimized'] = arange(n) + offset
+    rows['optimized'][~rows['clear']] = nan
+    rows['interpolated'] = arange(n) + offset
+    rows['status'] = 0
+    return rows
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root = mkdtemp()
+        self.store = Store(self.root, every=16)
+        # a few days either side of new year, in local time
+        self.rows = results(dtp.parse('2011-12-29 00:00 -0700'), 24 * 6)
+        self.store.write('x', self.rows)
+
+    def tearDown(self):
+        rmtree(self.root)
+
+    def testPartitions(self):
+        self.assertEqual(self.store.stations(), ['x'])
+        self.assertEqual(self.store.years('x'), [2011, 2012])
+
+    def testAll(self):
+        stored = self.store.read('x')
+        assert_array_equal(stored['time'], epoch(self.rows['time']))
+        assert_array_equal(stored['interpolated'], self.rows['interpolated'])
+        assert_array_equal(stored['clear'], self.rows['clear'])
+
+    def testRange(self):
+        start, end = self.rows['time'][30], self.rows['time'][100]
+        stored = self.store.read('x', start, end)
+        assert_array_equal(stored['time'], epoch(self.rows['time'][30:100]))
+
+    def testRangeBounds(self):
+        for i in range(0, len(self.rows), 7):
+            for j in range(i, len(self.rows), 11):
+                stored = self.store.read('x', self.rows['time'][i],
+                    self.rows['time'][j])
+                self.assertEqual(len(stored), j - i)
+
+    def testNaiveIsUTC(self):
+        stored = self.store.read('x', datetime(2012, 1, 1),
+            datetime(2012, 1, 1, 3))
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(stored['time'][0],
+            epoch([datetime(2012, 1, 1, tzinfo=tzutc())])[0])
+
+    def testEmpty(self):
+        self.assertEqual(len(self.store.read('x', 0, 1)), 0)
+        self.assertEqual(len(self.store.read('nobody')), 0)
+        self.assertEqual(self.store.read('x').dtype, RECORD)
+
+    def testReplace(self):
+        update = results(self.rows['time'][10], 5, offset=1000.0)
+        self.store.write('x', update)
+        stored = self.store.read('x')
+        self.assertEqual(len(stored), len(self.rows))
+        assert_array_equal(stored['interpolated'][10:15],
+            update['interpolated'])
+        assert_array_equal(stored['interpolated'][15:],
+            self.rows['interpolated'][15:])
+
+    def testOtherStride(self):
+        stored = Store(self.root, every=5).read('x', self.rows['time'][30],
+            self.rows['time'][100])
+        self.assertEqual(len(stored), 70)
+
+    def testStaleIndex(self):
+        # the rows swapped in, but not yet the index that goes with them
+        import os
+        from shutil import copy
+        index = os.path.join(self.root, 'x', '2012.index.npy')
+        copy(index, index + '.old')
+        self.store.write('x', results(self.rows['time'][70] +
+            timedelta(minutes=30), 30))
+        os.rename(index + '.old', index)
+        stored = self.store.read('x', self.rows['time'][70],
+            self.rows['time'][130])
+        self.assertEqual(len(stored), 60 + 30)
+
+    def testPartialIgnored(self):
+        import os
+        open(os.path.join(self.root, 'x', '2012.npy.partial.npy'), 'w')
+        self.assertEqual(self.store.years('x'), [2011, 2012])
+
+    def testAppendOutOfOrder(self):
+        later = results(self.rows['time'][-1] + timedelta(hours=1), 10)
+        earlier = results(self.rows['time'][0] - timedelta(hours=10), 10)
+        self.store.write('x', later)
+        self.store.write('x', earlier)
+        stored = self.store.read('x')
+        self.assertEqual(len(stored), len(self.rows) + 20)
+        self.assertTrue((stored['time'][1:] > stored['time'][:-1]).all())
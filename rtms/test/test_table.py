@@ -0,0 +1,118 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from StringIO import StringIO
+from numpy import isnan
+from .. import importer, table
+from ..selector import Selector
+from .fakertm import FakeRTM
+
+LATITUDE = 39.74 # degrees north
+LONGITUDE = 254.82 # degrees east
+base = {'latitude': LATITUDE, 'longitude': LONGITUDE, 'description': 'test'}
+CSV = """pressure,time,irradiance
+820,2012-01-01 00:00:00-07:00,0
+820,2012-01-01 12:00:00-07:00,640
+820,2012-01-01 12:01:00-07:00,641
+820,2012-01-01 12:02:00-07:00,649
+820,2012-01-01 12:03:00-07:00,650
+"""
+
+
+class TestTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = importer.table(StringIO(CSV))
+
+    def testBuild(self):
+        self.assertEqual(self.table.dtype.names, ('time', 'irradiance',
+            'pressure', 'clear', 'optimized', 'interpolated', 'status'))
+        self.assertFalse(self.table['clear'].any())
+        self.assertTrue(isnan(self.table['optimized']).all())
+        self.assertTrue(isnan(self.table['interpolated']).all())
+        self.assertFalse(self.table['status'].any())
+
+    def testSingleRow(self):
+        one = importer.table(StringIO("time,irradiance\n"
+            "2012-01-01 12:00:00-07:00,460\n"))
+        self.assertEqual(one.shape, (1,))
+
+    def testSelectInPlace(self):
+        selected = Selector(LATITUDE, LONGITUDE).select(self.table)
+        self.assertTrue(selected is self.table)
+        table.select(self.table, Selector(LATITUDE, LONGITUDE))
+        self.assertEqual(list(self.table['clear']),
+            [False, True, False, False, True])
+        self.assertEqual(list(self.table['status']),
+            [table.NIGHT, 0, 0, 0, 0])
+
+    def testSelectRejected(self):
+        self.table['status'][2] |= table.BAD_VALUE
+        table.select(self.table, Selector(LATITUDE, LONGITUDE))
+        self.assertEqual(list(self.table['clear']),
+            [False, True, False, True, True])
+        self.assertEqual(list(self.table['status']),
+            [table.NIGHT, 0, table.BAD_VALUE, 0, 0])
+
+    def testPoints(self):
+        points = table.points(self.table, self.table['irradiance'] > 645)
+        self.assertEqual(len(points), 2)
+        self.assertEqual(sorted(points[0]['settings']), ['pressure', 'time'])
+        self.assertEqual(points[0]['target'], 649)
+
+    def testPipeline(self):
+        table.select(self.table, Selector(LATITUDE, LONGITUDE))
+        table.optimize(self.table, base, FakeRTM, 'angstroms_coefficient')
+        optimized = self.table['optimized']
+        self.assertFalse(isnan(optimized[self.table['clear']]).any())
+        self.assertTrue(isnan(optimized[~self.table['clear']]).all())
+        table.interpolate(self.table)
+        interpolated = self.table['interpolated']
+        self.assertFalse(isnan(interpolated).any())
+        self.assertEqual(interpolated[1], optimized[1])
+        self.assertEqual(interpolated[4], optimized[4])
+        self.assertAlmostEqual(interpolated[2],
+            (2 * optimized[1] + optimized[4]) / 3)
+        self.assertEqual(list(self.table['status'] & table.INTERPOLATED),
+            [table.INTERPOLATED, 0, table.INTERPOLATED, table.INTERPOLATED, 0])
+
+    def testOutputs(self):
+        table.select(self.table, Selector(LATITUDE, LONGITUDE))
+        outputs = table.optimize(self.table, base, FakeRTM,
+            'angstroms_coefficient', outputs=['irradiance'])
+        clear = self.table['clear']
+        self.assertEqual(len(outputs), clear.sum())
+        self.assertTrue('global' in outputs[0]['irradiance'])
+        self.assertFalse(isnan(self.table['optimized'][clear]).any())
+
+    def testFailed(self):
+        self.table['irradiance'][1] = 5000 # brighter than space
+        table.select(self.table, Selector(LATITUDE, LONGITUDE))
+        self.table['clear'][1] = True
+        table.optimize(self.table, base, FakeRTM, 'angstroms_coefficient')
+        self.assertTrue(self.table['status'][1] & table.FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+    
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+    
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import os
+import sys
+import unittest
+import cPickle as pickle
+from shutil import rmtree
+from subprocess import Popen
+from tempfile import mkdtemp
+from threading import Event, Thread
+from time import sleep
+from .. import optimizer, workqueue
+from .fakertm import FakeRTM
+from .test_optimizer import base, aod, day_of_points
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def fail(thing):
+    raise ValueError('no good: {}'.format(thing))
+
+
+unstuck = Event()
+
+
+def hang(thing):
+    unstuck.wait()
+
+
+class TestQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.queue = workqueue.Queue(os.path.join(self.dir, 'queue.db'))
+        self.queue.put('run', ['a', 'b'])
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def testClaimOnce(self):
+        first = self.queue.claim('one')
+        second = self.queue.claim('two')
+        self.assertEqual([first[1], second[1]], ['a', 'b'])
+        self.assertEqual(self.queue.claim('three'), None)
+
+    def testLeaseExpiry(self):
+        task, payload = self.queue.claim('crashed', lease=0.05)
+        self.queue.claim('other')
+        sleep(0.1)
+        self.assertEqual(self.queue.claim('rescuer'), (task, payload))
+        self.assertFalse(self.queue.finish(task, 'crashed', 'late'))
+        self.assertTrue(self.queue.finish(task, 'rescuer', 'on time'))
+        self.assertEqual(self.queue.results('run')[0],
+            (workqueue.DONE, 'on time'))
+
+    def testGiveUp(self):
+        for worker in ('one', 'two', 'three'):
+            task, payload = self.queue.claim(worker, lease=0.01)
+            self.assertEqual(payload, 'a')
+            sleep(0.02)
+        self.assertEqual(self.queue.claim('four')[1], 'b')
+        state, result = self.queue.results('run')[0]
+        self.assertEqual(state, workqueue.FAILED)
+        self.assertTrue('gave up' in pickle.loads(result))
+
+    def testRenew(self):
+        task, _ = self.queue.claim('slow', lease=0.05)
+        self.queue.claim('other')
+        self.assertTrue(self.queue.renew(task, 'slow', lease=60))
+        sleep(0.1)
+        self.assertEqual(self.queue.claim('rescuer'), None)
+        self.assertFalse(self.queue.renew(task, 'rescuer'))
+
+    def testProgress(self):
+        task, _ = self.queue.claim('one')
+        self.queue.finish(task, 'one', 'x')
+        self.assertEqual(self.queue.progress('run'),
+            {workqueue.DONE: 1, workqueue.PENDING: 1})
+
+
+class TestWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.path = os.path.join(self.dir, 'queue.db')
+        self.map = workqueue.QueueMap(self.path, poll=0.05, timeout=60)
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def start(self, n):
+        return [Popen([sys.executable, '-c', 'from rtms import workqueue; '
+            'workqueue.work({!r}, poll=0.05, idle=1)'.format(self.path)],
+            cwd=ROOT) for _ in range(n)]
+
+    def testOptimize(self):
+        points = day_of_points(12)
+        workers = self.start(3)
+        try:
+            result = optimizer.optimize(points, base, FakeRTM, aod,
+                map_func=self.map)
+            batched = optimizer.optimize(points, base, FakeRTM, aod,
+                map_func=self.map, batch_size=5, spread=0.1)
+        finally:
+            for worker in workers:
+                worker.wait()
+        self.assertEqual(result, optimizer.optimize(points, base, FakeRTM,
+            aod))
+        self.assertEqual(batched, optimizer.optimize(points, base, FakeRTM,
+            aod, batch_size=5, spread=0.1))
+
+    def testInProcess(self):
+        queue = workqueue.Queue(self.path)
+        queue.put('run', [pickle.dumps((len, 'abc'))])
+        self.assertEqual(workqueue.work(self.path, idle=0.1), 1)
+        self.assertEqual(pickle.loads(queue.results('run')[0][1]), 3)
+
+    def testHeartbeat(self):
+        # a task longer than the lease isn't taken away from its worker
+        queue = workqueue.Queue(self.path)
+        queue.put('run', [pickle.dumps((sleep, 0.5))])
+        worker = Thread(target=workqueue.work, args=(self.path,),
+            kwargs={'lease': 0.15, 'idle': 0.2})
+        worker.start()
+        try:
+            sleep(0.3)
+            self.assertEqual(queue.claim('rescuer'), None)
+        finally:
+            worker.join()
+        self.assertEqual(queue.results('run')[0][0], workqueue.DONE)
+
+    def testHung(self):
+        # a task that never returns stops being renewed after max_runtime,
+        # and is failed once it has used up its attempts
+        queue = workqueue.Queue(self.path)
+        queue.put('run', [pickle.dumps((hang, None))])
+        worker = Thread(target=workqueue.work, args=(self.path,),
+            kwargs={'lease': 0.15, 'max_runtime': 0.3, 'idle': 0.1})
+        worker.daemon = True
+        worker.start()
+        try:
+            sleep(0.1)
+            self.assertEqual(queue.claim('rescuer', attempts=1), None)
+            sleep(0.7)
+            self.assertEqual(queue.claim('rescuer', attempts=1), None)
+            self.assertEqual(queue.progress('run'), {workqueue.FAILED: 1})
+        finally:
+            unstuck.set()
+            worker.join()
+        state, result = queue.results('run')[0]
+        self.assertEqual(state, workqueue.FAILED)
+        self.assertTrue('gave up' in pickle.loads(result))
+
+    def testFailures(self):
+        workers = self.start(1)
+        try:
+            with self.assertRaises(workqueue.TaskError) as caught:
+                self.map(fail, [1, 2])
+        finally:
+            workers[0].wait()
+        self.assertTrue('no good' in str(caught.exception))
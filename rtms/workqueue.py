@@ -0,0 +1,253 @@
+"""
+    Copyright (c) 2012 Philip Schliehauf (uniphil@gmail.com) and the
+    Queen's University Applied Sustainability Centre
+
+    This project is hosted on github; for up-to-date code and contacts:
+    https://github.com/Queens-Applied-Sustainability/RTMSuite
+
+    This file is part of RTMSuite.
+
+    RTMSuite is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RTMSuite is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RTMSuite.  If not, see <http://www.gnu.org/licenses/>.
+
+    ----
+
+    Spread the optimizing over more than one machine.
+
+    A QueueMap stands in for map_func. Instead of running the tasks, it puts
+    them in a queue (an SQLite file) and waits for workers to post the
+    results back:
+
+        optimize(points, info, SMARTS, 'angstroms_coefficient',
+            map_func=QueueMap('/shared/queue.db'), batch_size=60)
+
+    Start workers anywhere that can see the queue file, as many as you like:
+
+        python -m rtms.workqueue /shared/queue.db
+
+    A worker claims a task for a while (its lease), and keeps renewing the
+    lease for as long as it's working on the task, up to MAX_RUNTIME. If the
+    lease runs out anyway (the worker crashed, the machine went away, or the
+    task hung), the task can be claimed by another worker, and anything the
+    first one posts afterwards is ignored. A task that has had ATTEMPTS
+    leases run out (it keeps taking its workers down with it, or hanging) is
+    failed rather than handed out again.
+
+    Tasks are pickled, so the function and everything it's given must be
+    importable on the workers.
+
+"""
+
+import os
+import sys
+import socket
+import sqlite3
+import cPickle as pickle
+from threading import Thread, Event
+from time import time, sleep
+from traceback import format_exc
+from uuid import uuid4
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+LEASE = 600 # seconds
+ATTEMPTS = 3 # leases a task can have run out before it's failed
+MAX_RUNTIME = 3600 # seconds a worker keeps renewing its lease on a task
+POLL = 0.2 # seconds between checks for work or results
+
+
+class TaskError(RuntimeError): pass
+
+
+class Queue(object):
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                run TEXT,
+                position INTEGER,
+                payload BLOB,
+                state TEXT,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER DEFAULT 0,
+                result BLOB)''')
+            db.execute('''CREATE INDEX IF NOT EXISTS by_state
+                ON tasks (state, lease_until)''')
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.text_factory = str
+        return _Transaction(db)
+
+    def put(self, run, payloads):
+        with self._connect() as db:
+            db.executemany('INSERT INTO tasks (run, position, payload, state)'
+                ' VALUES (?, ?, ?, ?)', ((run, i, sqlite3.Binary(p), PENDING)
+                for i, p in enumerate(payloads)))
+
+    def claim(self, worker, lease=LEASE, attempts=ATTEMPTS):
+        """(task id, payload) of a task for worker to do, or None"""
+        now = time()
+        with self._connect() as db:
+            db.execute('UPDATE tasks SET state = ?, result = ? WHERE state = ?'
+                ' AND lease_until < ? AND attempts >= ?', (FAILED,
+                sqlite3.Binary(pickle.dumps('gave up after {} workers didn\'t'
+                ' finish it'.format(attempts), 2)), CLAIMED, now, attempts))
+            row = db.execute('SELECT id, payload FROM tasks WHERE state = ?'
+                ' OR (state = ? AND lease_until < ?) ORDER BY id LIMIT 1',
+                (PENDING, CLAIMED, now)).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE tasks SET state = ?, worker = ?,'
+                ' lease_until = ?, attempts = attempts + 1 WHERE id = ?',
+                (CLAIMED, worker, now + lease, row[0]))
+        return row[0], str(row[1])
+
+    def renew(self, task, worker, lease=LEASE):
+        """extend worker's lease on task; False if it's not theirs any more"""
+        with self._connect() as db:
+            renewed = db.execute('UPDATE tasks SET lease_until = ?'
+                ' WHERE id = ? AND worker = ? AND state = ?',
+                (time() + lease, task, worker, CLAIMED))
+            return renewed.rowcount == 1
+
+    def finish(self, task, worker, result, state=DONE):
+        """post a result; False if the task isn't worker's any more"""
+        with self._connect() as db:
+            done = db.execute('UPDATE tasks SET state = ?, result = ?'
+                ' WHERE id = ? AND worker = ? AND state = ?',
+                (state, sqlite3.Binary(result), task, worker, CLAIMED))
+            return done.rowcount == 1
+
+    def progress(self, run):
+        """{state: count} for run"""
+        with self._connect() as db:
+            return dict(db.execute('SELECT state, COUNT(*) FROM tasks'
+                ' WHERE run = ? GROUP BY state', (run,)).fetchall())
+
+    def results(self, run):
+        """(state, result) for every task of run, in order"""
+        with self._connect() as db:
+            return [(state, str(result)) for state, result in
+                db.execute('SELECT state, result FROM tasks WHERE run = ?'
+                ' ORDER BY position', (run,)).fetchall()]
+
+    def forget(self, run):
+        with self._connect() as db:
+            db.execute('DELETE FROM tasks WHERE run = ?', (run,))
+
+
+class _Transaction(object):
+    """an immediate (write-locked) transaction, closing the connection after"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, type, value, traceback):
+        self.db.execute('COMMIT' if type is None else 'ROLLBACK')
+        self.db.close()
+
+
+def _heartbeat(queue, task, worker, lease, stop, max_runtime):
+    """
+    renew the lease on task every third of a lease, until stop is set or
+    max_runtime is up
+    """
+    give_up = time() + max_runtime
+    while not stop.wait(lease / 3.) and time() < give_up:
+        if not queue.renew(task, worker, lease):
+            return
+
+
+def work(path, worker=None, lease=LEASE, poll=POLL, idle=None,
+    attempts=ATTEMPTS, max_runtime=MAX_RUNTIME):
+    """
+    Do tasks from the queue at path until there have been none for idle
+    seconds (forever, if idle is None). Returns how many were done.
+
+    A task still running after max_runtime seconds has its lease left to run
+    out, so a hung task doesn't keep the queue waiting for it.
+    """
+    queue = Queue(path)
+    worker = worker or '{}:{}'.format(socket.gethostname(), os.getpid())
+    done = 0
+    waiting_since = time()
+    while idle is None or time() - waiting_since < idle:
+        claimed = queue.claim(worker, lease, attempts)
+        if claimed is None:
+            sleep(poll)
+            continue
+        task, payload = claimed
+        stop = Event()
+        heartbeat = Thread(target=_heartbeat, args=(queue, task, worker,
+            lease, stop, max_runtime))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            func, thing = pickle.loads(payload)
+            result, state = func(thing), DONE
+        except Exception:
+            result, state = format_exc(), FAILED
+        finally:
+            stop.set()
+            heartbeat.join()
+        queue.finish(task, worker, pickle.dumps(result, 2), state)
+        done += 1
+        waiting_since = time()
+    return done
+
+
+class QueueMap(object):
+    """a map_func that has workers on the queue do the work"""
+
+    def __init__(self, path, poll=POLL, timeout=None):
+        self.queue = Queue(path)
+        self.poll = poll
+        self.timeout = timeout
+
+    def __call__(self, func, things):
+        run = uuid4().hex
+        self.queue.put(run, (pickle.dumps((func, thing), 2)
+            for thing in things))
+        started = time()
+        try:
+            while True:
+                progress = self.queue.progress(run)
+                if set(progress) <= set([DONE, FAILED]):
+                    break
+                if self.timeout and time() - started > self.timeout:
+                    raise TaskError('timed out with {} of {} tasks done'
+                        .format(progress.get(DONE, 0), sum(progress.values())))
+                sleep(self.poll)
+            results = self.queue.results(run)
+        finally:
+            self.queue.forget(run)
+        failed = [pickle.loads(r) for s, r in results if s == FAILED]
+        if failed:
+            raise TaskError('{} tasks failed; the first:\n{}'.format(
+                len(failed), failed[0]))
+        return [pickle.loads(r) for s, r in results]
+
+
+if __name__ == '__main__':
+    work(sys.argv[1])